@@ -1,23 +1,152 @@
 import sqlite3
 import os
+import threading
+import time
+
+POOL_SIZE = 5
+POOL_TIMEOUT = 10  # seconds to wait for a free connection
+
+
+class ConnectionPool:
+    """A thread-safe pool of SQLite connections to one database file."""
+
+    def __init__(self, database_path, max_size=POOL_SIZE,
+                 timeout=POOL_TIMEOUT, warm=0):
+        """
+        Initialize the pool.
+
+        Args:
+            database_path (str): Path to the SQLite database file. An
+                               in-memory database cannot be pooled, since
+                               every connection would get its own.
+            max_size (int): Most connections open at once.
+            timeout (float): Seconds acquire() waits for a free connection
+                           before raising TimeoutError.
+            warm (int): Connections to open up front.
+        """
+        if database_path == ":memory:":
+            raise ValueError("Cannot pool an in-memory database")
+        self.database_path = database_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = []
+        self._size = 0
+        self._cond = threading.Condition()
+        self.stats = {"created": 0, "reused": 0, "waits": 0,
+                      "timeouts": 0, "discarded": 0}
+        self.warm(warm)
+
+    def _connect(self):
+        # Connections move between threads as they are borrowed
+        conn = sqlite3.connect(self.database_path, check_same_thread=False)
+        with self._cond:
+            self.stats["created"] += 1
+        return conn
+
+    def warm(self, count):
+        """Open up to `count` idle connections ahead of the first use."""
+        while True:
+            with self._cond:
+                if len(self._idle) >= count or self._size >= self.max_size:
+                    return
+                self._size += 1
+            conn = self._connect()
+            with self._cond:
+                self._idle.append(conn)
+                self._cond.notify()
+
+    def acquire(self):
+        """Borrow a connection, opening one if the pool is not full."""
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            if not self._idle and self._size >= self.max_size:
+                self.stats["waits"] += 1
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats["timeouts"] += 1
+                    raise TimeoutError(
+                        f"No connection to {self.database_path} free "
+                        f"after {self.timeout}s")
+                self._cond.wait(remaining)
+            if self._idle:
+                self.stats["reused"] += 1
+                return self._idle.pop()
+            self._size += 1
+        try:
+            return self._connect()
+        except BaseException:
+            self._forget()
+            raise
+
+    def release(self, conn):
+        """Return a borrowed connection, rolling back anything left open."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self.discard(conn)
+            return
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def discard(self, conn):
+        """Close a broken connection instead of returning it."""
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        self._forget(discarded=True)
+
+    def _forget(self, discarded=False):
+        with self._cond:
+            self._size -= 1
+            self.stats["discarded"] += discarded
+            self._cond.notify()
+
+    def snapshot(self):
+        """Return the stats plus current open and idle counts."""
+        with self._cond:
+            return dict(self.stats, size=self._size, idle=len(self._idle))
+
+    def close(self):
+        """Close every idle connection."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn in idle:
+            conn.close()
+
 
 class DatabaseConnection:
     """A context manager for handling database connections automatically."""
     
-    def __init__(self, database_path=":memory:"):
+    def __init__(self, database_path=":memory:", pool=None):
         """
         Initialize the DatabaseConnection context manager.
         
         Args:
             database_path (str): Path to the SQLite database file. 
                                Defaults to in-memory database.
+            pool (ConnectionPool): Borrow a connection from this pool
+                                 instead of opening one. Pooled mode
+                                 prints nothing.
         """
+        if pool is not None and pool.database_path != database_path:
+            raise ValueError(
+                f"Pool is for {pool.database_path}, not {database_path}")
         self.database_path = database_path
+        self.pool = pool
         self.connection = None
         self.cursor = None
     
     def __enter__(self):
         """Enter the context - establish database connection."""
+        if self.pool is not None:
+            self.connection = self.pool.acquire()
+            self.cursor = self.connection.cursor()
+            return self.cursor
         try:
             self.connection = sqlite3.connect(self.database_path)
             self.cursor = self.connection.cursor()
@@ -29,6 +158,10 @@ class DatabaseConnection:
     
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Exit the context - close database connection."""
+        if self.pool is not None:
+            self._release(exc_type)
+            return False
+
         if self.cursor:
             self.cursor.close()
             print("Cursor closed")
@@ -47,6 +180,22 @@ class DatabaseConnection:
         # Return False to propagate exceptions, True to suppress them
         return False
 
+    def _release(self, exc_type):
+        """Commit or roll back, then hand the connection back to the pool."""
+        conn, self.connection = self.connection, None
+        try:
+            self.cursor.close()
+            if exc_type is None:
+                conn.commit()
+            else:
+                conn.rollback()
+        except sqlite3.Error:
+            self.pool.discard(conn)
+            raise
+        finally:
+            self.cursor = None
+        self.pool.release(conn)
+
 
 # Example usage with the context manager
 def main():
@@ -91,6 +240,19 @@ def main():
             
             for row in results:
                 print(f"{row[0]:2} | {row[1]:14} | {row[2]}")
+
+        # Pooled mode: tight loops reuse one warmed connection
+        pool = ConnectionPool(sample_db, warm=1)
+        start = time.perf_counter()
+        for user_id in range(1, 1001):
+            with DatabaseConnection(sample_db, pool=pool) as cursor:
+                cursor.execute("SELECT name FROM users WHERE id = ?",
+                               (user_id % 3 + 1,))
+                cursor.fetchone()
+        elapsed = time.perf_counter() - start
+        print(f"\n1000 pooled queries in {elapsed * 1000:.1f} ms: "
+              f"{pool.snapshot()}")
+        pool.close()
     
     except sqlite3.Error as e:
         print(f"Database error: {e}")
@@ -1,31 +1,166 @@
+import re
+import inspect
 import sqlite3
+import random
+import logging
 import functools
+import threading
+import time
+from bisect import bisect_left
+
+# Shared pooled decorator from 1-with_db_connection
+with_db_connection = __import__('1-with_db_connection').with_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, float("inf"))
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(query):
+    """Normalize a query so calls differing only in literals group together."""
+    if not query:
+        return "<unknown>"
+    text = _STRING.sub("?", query)
+    text = _NUMBER.sub("?", text)
+    text = _IN_LIST.sub("(?+)", text)
+    return _SPACE.sub(" ", text).strip().rstrip(";").lower()
+
+
+class QueryRegistry:
+    """In-process latency histograms and row counts per query fingerprint.
+
+    Only a `sample_rate` fraction of calls is timed; with enabled False
+    the decorator costs a single attribute check.
+    """
+
+    def __init__(self, enabled=True, sample_rate=1.0):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, query, seconds, rows, failed=False):
+        key = fingerprint(query)
+        bucket = bisect_left(BUCKETS_MS, seconds * 1000)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = {
+                    "calls": 0, "errors": 0, "rows": 0,
+                    "total_seconds": 0.0, "max_seconds": 0.0,
+                    "histogram": [0] * len(BUCKETS_MS),
+                }
+            stats["calls"] += 1
+            stats["errors"] += failed
+            stats["rows"] += rows
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            stats["histogram"][bucket] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {key: dict(stats, histogram=list(stats["histogram"]))
+                    for key, stats in self._stats.items()}
+
+    def top_slow(self, n=10, by="total_seconds"):
+        """Return the n fingerprints with the highest `by` value."""
+        ranked = sorted(self.snapshot().items(),
+                        key=lambda item: item[1][by], reverse=True)
+        return [dict(stats, query=key) for key, stats in ranked[:n]]
+
+    def report(self, n=10):
+        lines = [f"{'calls':>7} {'total ms':>10} {'avg ms':>8} "
+                 f"{'max ms':>8} {'rows':>8}  query"]
+        for stats in self.top_slow(n):
+            total_ms = stats["total_seconds"] * 1000
+            lines.append(
+                f"{stats['calls']:>7} {total_ms:>10.2f} "
+                f"{total_ms / stats['calls']:>8.3f} "
+                f"{stats['max_seconds'] * 1000:>8.3f} "
+                f"{stats['rows']:>8}  {stats['query']}")
+        return "\n".join(lines)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+registry = QueryRegistry()
+
+
+def _row_count(result):
+    # fetchall() returns a list of rows, fetchone() a row or None
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    return 1
+
+
+def _sampled():
+    return registry.enabled and (registry.sample_rate >= 1.0 or
+                                 random.random() < registry.sample_rate)
+
+
+def _query_of(args, kwargs):
+    # Extract query from kwargs or args
+    query = kwargs.get('query', None)
+    if not query and args:
+        query = args[0] if isinstance(args[0], str) else None
+    return query
+
 
 def log_queries(func):
-    """Decorator that logs SQL queries before executing them."""
+    """Decorator that records timing and row counts of SQL queries."""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            if not _sampled():
+                return await func(*args, **kwargs)
+            query = _query_of(args, kwargs)
+            start = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception:
+                registry.record(query, time.perf_counter() - start, 0, True)
+                raise
+            registry.record(query, time.perf_counter() - start,
+                            _row_count(result))
+            return result
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        # Extract query from kwargs or args
-        query = kwargs.get('query', None)
-        if not query and args:
-            query = args[0] if isinstance(args[0], str) else None
-        
-        print(f"Executing SQL Query: {query}")
-        
-        # Execute the original function
-        result = func(*args, **kwargs)
-        
+        if not _sampled():
+            return func(*args, **kwargs)
+
+        query = _query_of(args, kwargs)
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            registry.record(query, time.perf_counter() - start, 0, True)
+            raise
+        elapsed = time.perf_counter() - start
+        registry.record(query, elapsed, _row_count(result))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%.3f ms: %s", elapsed * 1000, query)
         return result
     return wrapper
 
 @log_queries
-def fetch_all_users(query):
-    conn = sqlite3.connect('users.db')
+@with_db_connection
+def fetch_all_users(conn, query):
     cursor = conn.cursor()
     cursor.execute(query)
-    results = cursor.fetchall()
-    conn.close()
-    return results
+    return cursor.fetchall()
 
 # Create test database and table
 def setup_test_database():
@@ -39,4 +174,15 @@ def setup_test_database():
         )
     ''')
     cursor.execute("INSERT OR IGNORE INTO users (name, email) VALUES ('John Doe', 'john@example.com')")
-    cursor.execute("INSERT OR IGN
+    cursor.execute("INSERT OR IGNORE INTO users (name, email) VALUES ('Jane Smith', 'jane@example.com')")
+    conn.commit()
+    conn.close()
+
+if __name__ == "__main__":
+    setup_test_database()
+    # Fetch users while logging the query
+    users = fetch_all_users(query="SELECT * FROM users")
+    print(users)
+    for user_id in range(1, 4):
+        fetch_all_users(query=f"SELECT * FROM users WHERE id = {user_id}")
+    print(registry.report())
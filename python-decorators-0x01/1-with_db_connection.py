@@ -1,23 +1,481 @@
+import sys
+import asyncio
+import inspect
+import contextvars
+import operator
 import sqlite3 
 import functools
+import threading
+import time
+import traceback
+import warnings
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+
+try:
+    import aiosqlite
+except ImportError:  # only needed by coroutine functions
+    aiosqlite = None
+
+DATABASE = 'users.db'
+POOL_SIZE = 8
+POOL_TIMEOUT = 30  # seconds to wait for a free connection
+LEAK_TIMEOUT = 60  # seconds a connection may stay checked out
+PRAGMAS = {"journal_mode": "WAL", "synchronous": "NORMAL"}
+STATEMENT_CACHE_SIZE = 128
+MAX_BATCH_KEYS = 500  # stay well under SQLite's bound-parameter limit
+
+
+def _caller_frames(limit=6):
+    # (code, line) pairs are cheap to keep; they are only formatted
+    # into a traceback if a leak gets reported
+    frame = sys._getframe(2)
+    frames = []
+    while frame is not None and len(frames) < limit:
+        frames.append((frame.f_code, frame.f_lineno))
+        frame = frame.f_back
+    return frames
+
+
+class SQLitePool:
+    """Thread-safe pool of SQLite connections.
+
+    A thread gets back the connection it used last when that one is
+    idle, and nested acquires on one thread share a connection. At most
+    max_size connections exist; further callers wait up to timeout
+    seconds. Connections checked out for longer than leak_timeout are
+    reported by check_leaks with the stack that acquired them.
+    """
+
+    def __init__(self, database=DATABASE, max_size=POOL_SIZE,
+                 timeout=POOL_TIMEOUT, pragmas=None,
+                 leak_timeout=LEAK_TIMEOUT,
+                 statement_cache_size=STATEMENT_CACHE_SIZE):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pragmas = PRAGMAS if pragmas is None else pragmas
+        self.leak_timeout = leak_timeout
+        self.statement_cache_size = statement_cache_size
+        self._local = threading.local()
+        self._cond = threading.Condition()
+        self._idle = []
+        self._size = 0
+        self._checked_out = {}  # id(conn) -> (thread name, since, stack)
+        self._reported = set()
+        self.stats = {"created": 0, "reused": 0, "waits": 0,
+                      "timeouts": 0, "leaks": 0}
+
+    def _connect(self):
+        # sqlite3 keeps compiled statements per connection, keyed by SQL
+        conn = sqlite3.connect(self.database, check_same_thread=False,
+                               cached_statements=self.statement_cache_size)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    def acquire(self):
+        local = self._local
+        if getattr(local, "depth", 0):
+            local.depth += 1
+            return local.conn
+        deadline = time.monotonic() + self.timeout
+        conn = None
+        with self._cond:
+            if not self._idle and self._size >= self.max_size:
+                self.stats["waits"] += 1
+                self.check_leaks()
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats["timeouts"] += 1
+                    raise TimeoutError(
+                        f"No connection to {self.database} free after "
+                        f"{self.timeout}s ({self._size} checked out)")
+                self._cond.wait(remaining)
+            if self._idle:
+                last = getattr(local, "last", None)
+                index = next((i for i, c in enumerate(self._idle)
+                              if c is last), -1)
+                conn = self._idle.pop(index)
+                self.stats["reused"] += 1
+            else:
+                self._size += 1
+        created = conn is None
+        if created:
+            try:
+                conn = self._connect()
+            except BaseException:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+        with self._cond:
+            if created:
+                self.stats["created"] += 1
+            self._checked_out[id(conn)] = (
+                threading.current_thread().name, time.monotonic(),
+                _caller_frames())
+        local.conn = local.last = conn
+        local.depth = 1
+        return conn
+
+    def release(self, conn):
+        local = self._local
+        local.depth -= 1
+        if local.depth:
+            return
+        local.conn = None
+        if conn.in_transaction:
+            conn.rollback()
+        with self._cond:
+            self._checked_out.pop(id(conn), None)
+            self._reported.discard(id(conn))
+            self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def check_leaks(self):
+        """Warn about and return connections held past leak_timeout."""
+        now = time.monotonic()
+        with self._cond:
+            leaks = [(key, info) for key, info in self._checked_out.items()
+                     if now - info[1] > self.leak_timeout]
+        for key, (thread, since, stack) in leaks:
+            if key not in self._reported:
+                self._reported.add(key)
+                self.stats["leaks"] += 1
+                where = "".join(traceback.format_list(
+                    [traceback.FrameSummary(code.co_filename, line,
+                                            code.co_name)
+                     for code, line in reversed(stack)]))
+                warnings.warn(
+                    f"Connection held by {thread} for {now - since:.0f}s, "
+                    f"acquired at:\n{where}", ResourceWarning)
+        return [info for _, info in leaks]
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn in idle:
+            conn.close()
+
+
+class AsyncSQLitePool:
+    """aiosqlite counterpart of SQLitePool for coroutine functions.
+
+    At most max_size connections are checked out; further tasks wait
+    on a semaphore instead of blocking the event loop. Nested acquires
+    in one task share a connection, like nested acquires on one thread
+    in SQLitePool.
+    """
+
+    def __init__(self, database=DATABASE, max_size=POOL_SIZE,
+                 timeout=POOL_TIMEOUT, pragmas=None):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pragmas = PRAGMAS if pragmas is None else pragmas
+        self._idle = []
+        self._slots = None
+        self._loop = None
+        # (task, connection) checked out by the current task, if any
+        self._current = contextvars.ContextVar("async_pool_connection",
+                                               default=None)
+        self.stats = {"created": 0, "reused": 0}
+
+    def _semaphore(self):
+        # Semaphores belong to one event loop; make a new one per loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_size)
+        return self._slots
+
+    async def _connect(self):
+        if aiosqlite is None:
+            raise ImportError("aiosqlite is required for async functions")
+        conn = aiosqlite.connect(self.database)
+        # Idle connections outlive asyncio.run(); a daemon worker thread
+        # keeps them from blocking interpreter exit. Older aiosqlite
+        # versions make the connection itself the Thread.
+        getattr(conn, "_thread", conn).daemon = True
+        await conn
+        for name, value in self.pragmas.items():
+            await conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    @asynccontextmanager
+    async def connection(self):
+        task = asyncio.current_task()
+        current = self._current.get()
+        # Child tasks inherit the context but not the connection
+        if current is not None and current[0] is task:
+            yield current[1]
+            return
+        slots = self._semaphore()
+        await asyncio.wait_for(slots.acquire(), self.timeout)
+        try:
+            if self._idle:
+                conn = self._idle.pop()
+                self.stats["reused"] += 1
+            else:
+                conn = await self._connect()
+                self.stats["created"] += 1
+            token = self._current.set((task, conn))
+            try:
+                yield conn
+            finally:
+                self._current.reset(token)
+                if conn.in_transaction:
+                    await conn.rollback()
+                self._idle.append(conn)
+        finally:
+            slots.release()
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            await conn.close()
+
+
+pool = SQLitePool()
+async_pool = AsyncSQLitePool()
+
+
+def configure_pool(**kwargs):
+    """Replace the shared pool, e.g. configure_pool(max_size=16)."""
+    global pool
+    old, pool = pool, SQLitePool(**kwargs)
+    old.close()
+    return pool
+
 
 def with_db_connection(func):
-    """Decorator that automatically handles database connections."""
+    """Decorator that passes a pooled database connection to func.
+
+    Coroutine functions get an aiosqlite connection from async_pool.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            async with async_pool.connection() as conn:
+                return await func(conn, *args, **kwargs)
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        # Connect to database
-        conn = sqlite3.connect('users.db')
+        # Borrow a connection; it goes back to the pool even on error
+        with pool.connection() as conn:
+            return func(conn, *args, **kwargs)
+    return wrapper
+
+class _Queue(dict):
+    """Keys queued by load() on one thread, mapped to their Pending.
+
+    The first dispatch claims it; later ones wait until it finishes.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.claimed = False
+        self.finished = threading.Event()
+
+
+class Pending:
+    """Result of a BatchLoader.load, filled in when its batch runs.
+
+    result() may be called from any thread; it dispatches the batch the
+    key was queued in.
+    """
+
+    def __init__(self, loader, queue):
+        self._loader = loader
+        self._queue = queue
+        self._done = False
+        self._value = None
+        self._error = None
+
+    def _set(self, value=None, error=None):
+        self._value, self._error, self._done = value, error, True
+
+    def done(self):
+        return self._done
+
+    def result(self):
+        if not self._done:
+            self._loader.dispatch(self._queue)
+        if not self._done:
+            raise RuntimeError("Batch ended before this key was fetched")
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+class BatchLoader:
+    """Collapses point lookups into calls of a bulk fetch function.
+
+    func(keys) returns the rows for a list of keys and key_of(row) gives
+    each row's key; keys without a row resolve to None. load() queues a
+    key for this thread and returns a Pending, and the first result()
+    fetches every queued key at once. aload() does the same for
+    coroutine functions, collecting keys awaited in one loop iteration.
+    Duplicate keys in a batch share a single lookup.
+    """
+
+    def __init__(self, func, key_of, max_batch=MAX_BATCH_KEYS):
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.key_of = key_of
+        self.max_batch = max_batch
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._loop_queues = weakref.WeakKeyDictionary()
+        self._tasks = set()
+        self.batches = 0
+        self.keys_loaded = 0
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def _chunks(self, keys):
+        for start in range(0, len(keys), self.max_batch):
+            chunk = keys[start:start + self.max_batch]
+            with self._lock:
+                self.batches += 1
+                self.keys_loaded += len(chunk)
+            yield chunk
+
+    def _by_key(self, rows):
+        return {self.key_of(row): row for row in rows}
+
+    def load(self, key):
+        with self._lock:
+            queue = getattr(self._local, "queue", None)
+            if queue is None or queue.claimed:
+                queue = self._local.queue = _Queue()
+            pending = queue.get(key)
+            if pending is None:
+                pending = queue[key] = Pending(self, queue)
+        return pending
+
+    def load_many(self, keys):
+        pending = [self.load(key) for key in keys]
+        return [p.result() for p in pending]
+
+    def dispatch(self, queue=None):
+        """Fetch every key in `queue`, by default the keys queued by
+        load() on this thread."""
+        with self._lock:
+            if queue is None:
+                queue = getattr(self._local, "queue", None)
+                if queue is None:
+                    return
+            claimed, queue.claimed = queue.claimed, True
+        if claimed:
+            queue.finished.wait()
+            return
         try:
-            # Pass connection as first argument to the function
-            result = func(conn, *args, **kwargs)
-            return result
-        except Exception as e:
-            # Re-raise the exception
-            raise e
+            for chunk in self._chunks(list(queue)):
+                try:
+                    found = self._by_key(self.func(chunk))
+                except Exception as exc:
+                    for key in chunk:
+                        queue[key]._set(error=exc)
+                    continue
+                for key in chunk:
+                    queue[key]._set(found.get(key))
         finally:
-            # Always close the connection
-            conn.close()
-    return wrapper
+            queue.finished.set()
+
+    @contextmanager
+    def batch(self):
+        """Dispatch whatever is still queued when the block exits."""
+        try:
+            yield self
+        finally:
+            self.dispatch()
+
+    async def aload(self, key):
+        loop = asyncio.get_running_loop()
+        queue = self._loop_queues.get(loop)
+        if queue is None:
+            queue = self._loop_queues[loop] = {}
+            # Runs after every task already scheduled this iteration
+            loop.call_soon(self._dispatch_async, loop)
+        future = queue.get(key)
+        if future is None:
+            future = queue[key] = loop.create_future()
+        return await asyncio.shield(future)
+
+    async def aload_many(self, keys):
+        return await asyncio.gather(*(self.aload(key) for key in keys))
+
+    def _dispatch_async(self, loop):
+        queue = self._loop_queues.pop(loop, {})
+        task = loop.create_task(self._run_async(queue))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_async(self, queue):
+        for chunk in self._chunks(list(queue)):
+            try:
+                found = self._by_key(await self.func(chunk))
+            except Exception as exc:
+                for key in chunk:
+                    if not queue[key].done():
+                        queue[key].set_exception(exc)
+                continue
+            for key in chunk:
+                if not queue[key].done():
+                    queue[key].set_result(found.get(key))
+
+
+def batch_loader(key_of=operator.itemgetter(0), max_batch=MAX_BATCH_KEYS):
+    """Decorator turning a bulk fetch func(keys) into a BatchLoader.
+
+    Calling the result directly still runs func unchanged.
+    """
+    def decorator(func):
+        return BatchLoader(func, key_of, max_batch)
+    return decorator
+
+
+def in_clause(keys):
+    """Placeholders for keys, padded to a power of two so the statement
+    cache sees a handful of distinct SQL texts. Returns (sql, params)."""
+    size = 1
+    while size < len(keys):
+        size *= 2
+    params = list(keys) + [keys[-1]] * (size - len(keys))
+    return ", ".join("?" * size), params
+
+
+@batch_loader()
+@with_db_connection
+def get_users_by_ids(conn, user_ids):
+    placeholders, params = in_clause(user_ids)
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT * FROM users WHERE id IN ({placeholders})", params)
+    return cursor.fetchall()
+
+@batch_loader()
+@with_db_connection
+async def get_users_by_ids_async(conn, user_ids):
+    placeholders, params = in_clause(user_ids)
+    async with conn.execute(
+            f"SELECT * FROM users WHERE id IN ({placeholders})",
+            params) as cursor:
+        return await cursor.fetchall()
 
 @with_db_connection 
 def get_user_by_id(conn, user_id): 
@@ -25,6 +483,11 @@ def get_user_by_id(conn, user_id):
     cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,)) 
     return cursor.fetchone()
 
+@with_db_connection
+async def get_user_by_id_async(conn, user_id):
+    async with conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)) as cursor:
+        return await cursor.fetchone()
+
 # Setup test database
 def setup_test_database():
     conn = sqlite3.connect('users.db')
@@ -45,3 +508,8 @@ if __name__ == "__main__":
     # Fetch user by ID with automatic connection handling 
     user = get_user_by_id(user_id=1)
     print(user)
+    # Many lookups, one IN query
+    pending = [get_users_by_ids.load(user_id) for user_id in range(1, 4)]
+    print([p.result() for p in pending])
+    print(f"{get_users_by_ids.keys_loaded} keys in "
+          f"{get_users_by_ids.batches} batch(es)")
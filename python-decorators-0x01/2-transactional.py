@@ -1,36 +1,248 @@
+import re
+import time
+import inspect
 import sqlite3 
 import functools
+import itertools
+import threading
+from contextlib import asynccontextmanager, contextmanager
 
-# Copy the with_db_connection decorator from previous task
-def with_db_connection(func):
-    """Decorator that automatically handles database connections."""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
+# Shared pooled decorator from the previous task
+db = __import__('1-with_db_connection')
+with_db_connection = db.with_db_connection
+
+FLUSH_SIZE = 100
+FLUSH_INTERVAL = 1.0  # seconds
+
+# Callables run with the set of tables written after each commit
+commit_listeners = []
+
+WRITE_PATTERN = re.compile(
+    r'^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO'
+    r'|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+["`\[]?(\w+)',
+    re.IGNORECASE)
+
+
+def on_commit(listener):
+    """Register listener(tables) to run after a transaction commits."""
+    commit_listeners.append(listener)
+    return listener
+
+
+def written_tables(statements):
+    """Return the lower-cased names of tables the statements write to."""
+    tables = set()
+    for statement in statements:
+        match = WRITE_PATTERN.match(statement)
+        if match:
+            tables.add(match.group(1).lower())
+    return tables
+
+
+def notify_commit(tables):
+    if tables:
+        for listener in commit_listeners:
+            listener(tables)
+
+
+# Connections with a @transactional call running on this thread, mapped
+# to the statements it has executed so far
+_running = threading.local()
+_savepoints = itertools.count(1)
+
+
+def _running_on(conn):
+    return id(conn) in getattr(_running, "conns", {})
+
+
+@contextmanager
+def _tracking(conn):
+    """Record the statements run on conn by an outermost call."""
+    conns = _running.__dict__.setdefault("conns", {})
+    statements = conns[id(conn)] = []
+    conn.set_trace_callback(statements.append)
+    try:
+        yield statements
+    finally:
+        conn.set_trace_callback(None)
+        del conns[id(conn)]
+
+
+@asynccontextmanager
+async def _tracking_async(conn):
+    """_tracking for an aiosqlite connection."""
+    conns = _running.__dict__.setdefault("conns", {})
+    statements = conns[id(conn)] = []
+    await conn.set_trace_callback(statements.append)
+    try:
+        yield statements
+    finally:
+        await conn.set_trace_callback(None)
+        del conns[id(conn)]
+
+
+def run_in_savepoint(conn, func, args, kwargs):
+    """Run func(conn, ...) in a SAVEPOINT of the open transaction.
+
+    An error rolls back only this call; committing is left to whoever
+    owns the transaction.
+    """
+    savepoint = f"tx_{next(_savepoints)}"
+    conn.execute(f"SAVEPOINT {savepoint}")
+    try:
+        result = func(conn, *args, **kwargs)
+    except Exception as e:
+        conn.execute(f"ROLLBACK TO {savepoint}")
+        conn.execute(f"RELEASE {savepoint}")
+        print(f"Transaction rolled back due to error: {e}")
+        raise e
+    conn.execute(f"RELEASE {savepoint}")
+    return result
+
+
+async def run_in_savepoint_async(conn, func, args, kwargs):
+    """run_in_savepoint for a coroutine function on aiosqlite."""
+    savepoint = f"tx_{next(_savepoints)}"
+    await conn.execute(f"SAVEPOINT {savepoint}")
+    try:
+        result = await func(conn, *args, **kwargs)
+    except Exception as e:
+        await conn.execute(f"ROLLBACK TO {savepoint}")
+        await conn.execute(f"RELEASE {savepoint}")
+        print(f"Transaction rolled back due to error: {e}")
+        raise e
+    await conn.execute(f"RELEASE {savepoint}")
+    return result
+
+
+class TransactionBatch:
+    """Groups @transactional calls on one connection into fewer commits.
+
+    Each call runs inside its own SAVEPOINT, so a failing call is rolled
+    back on its own while earlier calls stay pending. Pending calls are
+    committed every flush_size calls or flush_interval seconds.
+    """
+
+    def __init__(self, conn, flush_size=FLUSH_SIZE,
+                 flush_interval=FLUSH_INTERVAL):
+        self.conn = conn
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.pending = 0
+        self.commits = 0
+        self.tables = set()
+        self._started = time.monotonic()
+
+    def run(self, func, args, kwargs):
+        conn = self.conn
+        if not conn.in_transaction:
+            # Explicit BEGIN: releasing a savepoint that opened the
+            # transaction would commit it
+            conn.execute("BEGIN")
+        with _tracking(conn) as statements:
+            result = run_in_savepoint(conn, func, args, kwargs)
+        self.tables |= written_tables(statements)
+        self.pending += 1
+        if (self.pending >= self.flush_size or
+                time.monotonic() - self._started >= self.flush_interval):
+            self.flush()
+        return result
+
+    def flush(self):
+        """Commit the pending calls."""
+        if self.conn.in_transaction:
+            self.conn.commit()
+            self.commits += 1
+        tables, self.tables = self.tables, set()
+        self.pending = 0
+        self._started = time.monotonic()
+        notify_commit(tables)
+
+
+_batches = threading.local()
+
+
+@contextmanager
+def batched_transactions(flush_size=FLUSH_SIZE, flush_interval=FLUSH_INTERVAL):
+    """Run the @transactional calls made on this thread in batches.
+
+    The scope holds one pooled connection, which with_db_connection
+    hands back to every call made inside it. Pending calls are committed
+    on exit. If an exception escapes the scope they are rolled back.
+    Nested scopes join the outer batch.
+    """
+    current = getattr(_batches, "current", None)
+    if current is not None:
+        yield current
+        return
+    with db.pool.connection() as conn:
+        batch = _batches.current = TransactionBatch(conn, flush_size,
+                                                    flush_interval)
         try:
-            result = func(conn, *args, **kwargs)
-            return result
-        except Exception as e:
-            raise e
+            yield batch
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            batch.flush()
         finally:
-            conn.close()
-    return wrapper
+            _batches.current = None
+
 
 def transactional(func):
-    """Decorator that manages database transactions."""
+    """Decorator that manages database transactions.
+
+    A call made while another @transactional call (or the caller's own
+    transaction) is open on the same connection runs in a SAVEPOINT and
+    leaves the commit to the outer transaction. Coroutine functions get
+    the same nesting and are committed or rolled back with await on
+    their aiosqlite connection; batching applies to sync calls only.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(conn, *args, **kwargs):
+            if _running_on(conn) or conn.in_transaction:
+                return await run_in_savepoint_async(conn, func, args, kwargs)
+            async with _tracking_async(conn) as statements:
+                try:
+                    await conn.execute("BEGIN")
+                    result = await func(conn, *args, **kwargs)
+                    await conn.commit()
+                except Exception as e:
+                    await conn.rollback()
+                    print(f"Transaction rolled back due to error: {e}")
+                    raise e
+            notify_commit(written_tables(statements))
+            return result
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
-        try:
-            # Execute the function
-            result = func(conn, *args, **kwargs)
-            # If no exception, commit the transaction
-            conn.commit()
-            return result
-        except Exception as e:
-            # If exception occurs, rollback the transaction
-            conn.rollback()
-            print(f"Transaction rolled back due to error: {e}")
-            raise e
+        if _running_on(conn):
+            # Nested: the outer call records our statements and commits
+            return run_in_savepoint(conn, func, args, kwargs)
+        batch = getattr(_batches, "current", None)
+        if batch is not None and batch.conn is conn:
+            return batch.run(func, args, kwargs)
+        if conn.in_transaction:
+            # The caller owns this transaction and its commit
+            return run_in_savepoint(conn, func, args, kwargs)
+        # Record executed statements to learn which tables were written
+        with _tracking(conn) as statements:
+            try:
+                # Explicit BEGIN so nested calls cannot commit our work
+                conn.execute("BEGIN")
+                # Execute the function
+                result = func(conn, *args, **kwargs)
+                # If no exception, commit the transaction
+                conn.commit()
+            except Exception as e:
+                # If exception occurs, rollback the transaction
+                conn.rollback()
+                print(f"Transaction rolled back due to error: {e}")
+                raise e
+        notify_commit(written_tables(statements))
+        return result
     return wrapper
 
 @with_db_connection 
@@ -40,6 +252,11 @@ def update_user_email(conn, user_id, new_email):
     cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
     print(f"Updated user {user_id} email to {new_email}")
 
+@with_db_connection
+@transactional
+async def update_user_email_async(conn, user_id, new_email):
+    await conn.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
+
 # Setup test database
 def setup_test_database():
     conn = sqlite3.connect('users.db')
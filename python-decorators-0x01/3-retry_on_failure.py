@@ -1,43 +1,263 @@
 import time
+import random
+import asyncio
+import inspect
 import sqlite3 
 import functools
+import threading
+from collections import deque
+
+# Shared pooled decorator from the previous task
+with_db_connection = __import__('1-with_db_connection').with_db_connection
+
+# OperationalError messages that mean "try again later", not a bug
+TRANSIENT_ERRORS = (
+    "database is locked",
+    "database table is locked",
+    "database is busy",
+    "disk i/o error",
+    "unable to open database file",
+)
+
+# Per-function retry counters, keyed by "module.qualname"
+retry_stats = {}
+_stats_lock = threading.Lock()
+
+
+def is_transient(error):
+    """Return True for SQLite errors caused by contention or I/O."""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    message = str(error).lower()
+    return any(text in message for text in TRANSIENT_ERRORS)
+
+
+def _count(stats, name, amount=1):
+    with _stats_lock:
+        stats[name] += amount
+
+
+def retry_on_failure(retries=3, delay=2, max_delay=30, deadline=None,
+                     retry_if=is_transient):
+    """Decorator that retries database operations if they fail.
+
+    Only errors accepted by retry_if are retried. Attempt n sleeps a
+    random time between 0 and min(max_delay, delay * 2**n) (full
+    jitter), so contending workers spread out instead of retrying in
+    lockstep. No retry starts once `deadline` seconds would be exceeded.
+    Counters are kept in retry_stats and on wrapper.retry_stats.
+    Coroutine functions back off with asyncio.sleep. `retries` is the
+    total number of attempts and must be at least 1.
+    """
+    if retries < 1:
+        raise ValueError(f"retries must be at least 1, got {retries}")
+
+    def backoff(stats, attempt, error, start):
+        """Return seconds to wait before the next attempt, or None to
+        give up on `error`; raises it if it is not retryable."""
+        if not retry_if(error):
+            _count(stats, "failures")
+            raise error
+        if attempt == retries - 1:  # Don't sleep on last attempt
+            return None
+        pause = random.uniform(0, min(max_delay, delay * 2 ** attempt))
+        if (deadline is not None and
+                time.monotonic() - start + pause > deadline):
+            return None
+        print(f"Attempt {attempt + 1} failed: {error}. Retrying in {pause:.2f} seconds...")
+        _count(stats, "retries")
+        _count(stats, "slept_seconds", pause)
+        return pause
+
+    def give_up(stats, attempt, error):
+        print(f"All {attempt + 1} attempts failed. Last error: {error}")
+        _count(stats, "gave_up")
+        # If all retries failed, raise the last exception
+        raise error
 
-# Paste your with_db_connection decorator here
-def with_db_connection(func):
-    """Decorator that automatically handles database connections."""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            result = func(conn, *args, **kwargs)
-            return result
-        except Exception as e:
-            raise e
-        finally:
-            conn.close()
-    return wrapper
-
-def retry_on_failure(retries=3, delay=2):
-    """Decorator that retries database operations if they fail."""
     def decorator(func):
+        name = f"{func.__module__}.{func.__qualname__}"
+        stats = retry_stats.setdefault(name, {
+            "calls": 0, "retries": 0, "failures": 0, "gave_up": 0,
+            "slept_seconds": 0.0,
+        })
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                _count(stats, "calls")
+                start = time.monotonic()
+                for attempt in range(retries):
+                    try:
+                        return await func(*args, **kwargs)
+                    except Exception as e:
+                        pause = backoff(stats, attempt, e, start)
+                        if pause is None:
+                            give_up(stats, attempt, e)
+                    await asyncio.sleep(pause)
+            async_wrapper.retry_stats = stats
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            last_exception = None
+            _count(stats, "calls")
+            start = time.monotonic()
             for attempt in range(retries):
                 try:
                     return func(*args, **kwargs)
                 except Exception as e:
-                    last_exception = e
-                    if attempt < retries - 1:  # Don't sleep on last attempt
-                        print(f"Attempt {attempt + 1} failed: {e}. Retrying in {delay} seconds...")
-                        time.sleep(delay)
-                    else:
-                        print(f"All {retries} attempts failed. Last error: {e}")
-            # If all retries failed, raise the last exception
-            raise last_exception
+                    pause = backoff(stats, attempt, e, start)
+                    if pause is None:
+                        give_up(stats, attempt, e)
+                time.sleep(pause)
+        wrapper.retry_stats = stats
         return wrapper
     return decorator
 
+class CircuitOpenError(Exception):
+    """Raised instead of calling the database while a circuit is open."""
+
+
+class CircuitBreaker:
+    """Fail fast while the recent failure rate says the database is down.
+
+    Tracks the last `window` outcomes. Once at least min_calls are
+    recorded and the failing share reaches failure_rate, the circuit
+    opens and calls raise CircuitOpenError without touching the
+    database. After reset_timeout seconds it lets half_open_calls probe
+    calls through: a success closes it, a failure opens it again. A
+    probe cancelled or interrupted before either frees its slot for the
+    next caller. Only errors accepted by failure_if count as failures.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_rate=0.5, window=20, min_calls=5,
+                 reset_timeout=30, half_open_calls=1,
+                 failure_if=is_transient):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.failure_if = failure_if
+        self._outcomes = deque(maxlen=window)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._half_opened = 0  # counts HALF_OPEN periods
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "failures": 0, "rejected": 0,
+                      "opened": 0}
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if (self._state == self.OPEN and
+                time.monotonic() - self._opened_at >= self.reset_timeout):
+            self._state = self.HALF_OPEN
+            self._probes = 0
+            self._half_opened += 1
+        return self._state
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self.stats["opened"] += 1
+
+    def _before_call(self):
+        """Admit a call or raise CircuitOpenError. Returns the half-open
+        period a probe belongs to, or None for a normal call."""
+        with self._lock:
+            state = self._current_state()
+            probe = None
+            if state == self.HALF_OPEN and self._probes < self.half_open_calls:
+                self._probes += 1
+                probe = self._half_opened
+            elif state != self.CLOSED:
+                self.stats["rejected"] += 1
+                raise CircuitOpenError(
+                    f"Circuit {state}; retry after {self.reset_timeout}s")
+            self.stats["calls"] += 1
+            return probe
+
+    def _abandon(self, probe):
+        """A call ended with no outcome, e.g. CancelledError or
+        KeyboardInterrupt; give its probe slot back."""
+        with self._lock:
+            if (probe is not None and self._state == self.HALF_OPEN
+                    and probe == self._half_opened):
+                self._probes -= 1
+
+    def _record(self, failed, probe=None):
+        with self._lock:
+            if failed:
+                self.stats["failures"] += 1
+            if self._state == self.HALF_OPEN:
+                # Only this period's probes decide; a slow call admitted
+                # before the circuit opened does not
+                if probe == self._half_opened:
+                    if failed:
+                        self._open()
+                    else:
+                        self._state = self.CLOSED
+                        self._outcomes.clear()
+                return
+            if self._state != self.CLOSED:
+                return
+            self._outcomes.append(failed)
+            if (len(self._outcomes) >= self.min_calls and
+                    sum(self._outcomes) / len(self._outcomes)
+                    >= self.failure_rate):
+                self._open()
+                self._outcomes.clear()
+
+    def __call__(self, func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                probe = self._before_call()
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    self._record(self.failure_if(e), probe)
+                    raise
+                except BaseException:
+                    self._abandon(probe)
+                    raise
+                self._record(False, probe)
+                return result
+            async_wrapper.breaker = self
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            probe = self._before_call()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                self._record(self.failure_if(e), probe)
+                raise
+            except BaseException:
+                self._abandon(probe)
+                raise
+            self._record(False, probe)
+            return result
+        wrapper.breaker = self
+        return wrapper
+
+
+def circuit_breaker(**kwargs):
+    """Decorator form of CircuitBreaker; put it above with_db_connection
+    so an open circuit fails before a connection is borrowed."""
+    return CircuitBreaker(**kwargs)
+
+
+@circuit_breaker()
 @with_db_connection
 @retry_on_failure(retries=3, delay=1)
 def fetch_users_with_retry(conn):
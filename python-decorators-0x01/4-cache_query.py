@@ -1,50 +1,570 @@
+import os
+import sys
 import time
+import asyncio
+import inspect
+import pickle
 import sqlite3 
+import re
 import functools
 import hashlib
+import logging
+import threading
+from collections import OrderedDict
 
-# Global cache dictionary
-query_cache = {}
+transactional = __import__('2-transactional')
+# Shared pooled decorator from 1-with_db_connection
+with_db_connection = __import__('1-with_db_connection').with_db_connection
 
-def with_db_connection(func):
-    """Decorator that automatically handles database connections."""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
+logger = logging.getLogger(__name__)
+
+CACHE_MAX_ENTRIES = 1024
+CACHE_TTL = 300  # seconds
+CACHE_MAX_BYTES = 16 * 1024 * 1024
+SINGLE_FLIGHT_TIMEOUT = 30  # seconds
+SHARED_CACHE_PATH = 'query_cache.db'
+SHARED_CACHE_MAX_ENTRIES = 10000
+SHARED_CACHE_PURGE_EVERY = 100  # set() calls between purges
+
+_MISSING = object()
+
+# A FROM list runs until the next clause keyword or parenthesis, so
+# comma joins are seen and subqueries are scanned on their own
+FROM_PATTERN = re.compile(
+    r'\bFROM\s+([^();]*?)(?=\b(?:WHERE|GROUP|ORDER|LIMIT|HAVING|UNION'
+    r'|EXCEPT|INTERSECT|JOIN|INNER|LEFT|RIGHT|FULL|CROSS|NATURAL|ON|USING'
+    r')\b|[();]|$)', re.IGNORECASE)
+JOIN_PATTERN = re.compile(r'\bJOIN\s+["`\[]?(\w+)', re.IGNORECASE)
+TABLE_NAME = re.compile(r'\s*["`\[]?(\w+)')
+LITERAL_PATTERN = re.compile(r"('(?:[^']|'')*')")
+
+
+class QueryCache:
+    """Thread-safe query result cache bounded by entry count and bytes.
+
+    Entries expire ttl seconds after they are stored; when either bound
+    is exceeded the least recently used entries are evicted first.
+    Entries can be tagged with the tables they read so that
+    invalidate_tables drops them when those tables change. Each
+    invalidation also bumps the tables' generation; a set() given the
+    generation seen before the query ran is skipped if a write committed
+    in between, so a slow reader cannot store a stale result.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL,
+                 max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._keys_by_table = {}  # table -> set of keys
+        self._tables_by_key = {}
+        self._generations = {}  # table -> invalidation count
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_skips = 0
+
+    def generation(self, tables):
+        """Return a token that changes whenever any of `tables` is
+        invalidated."""
+        with self._lock:
+            return self._generation(tables)
+
+    def _generation(self, tables):
+        return sum(self._generations.get(table, 0) for table in tables)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def peek(self, key, default=None):
+        """Like get, but without touching the stats or LRU order."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                return default
+            return entry[0]
+
+    def set(self, key, value, ttl=None, tables=(), generation=None):
+        """Store value; returns False if it was too big or stale."""
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return False
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if (generation is not None
+                    and generation != self._generation(tables)):
+                self.stale_skips += 1
+                return False
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires_at, size)
+            self.bytes += size
+            if tables:
+                self._tables_by_key[key] = tables
+                for table in tables:
+                    self._keys_by_table.setdefault(table, set()).add(key)
+            while (len(self._entries) > self.max_entries
+                   or self.bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return True
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self.bytes -= size
+        for table in self._tables_by_key.pop(key, ()):
+            keys = self._keys_by_table[table]
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_table[table]
+
+    def invalidate_tables(self, tables):
+        """Drop every entry that read from any of `tables`."""
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+                for key in list(self._keys_by_table.get(table, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_table.clear()
+            self._tables_by_key.clear()
+            self.bytes = 0
+
+    def stats(self):
+        return {"entries": len(self._entries), "bytes": self.bytes,
+                "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "stale_skips": self.stale_skips}
+
+
+def _estimate_size(value):
+    try:
+        return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _LeaderCancelled(Exception):
+    """The task running a shared call was cancelled; a waiter retries."""
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while
+    it is in flight wait up to `timeout` seconds and get the same result
+    or exception. do() serves threads, do_async() asyncio tasks. If the
+    leading task is cancelled its waiters are not: the first of them
+    takes over and runs its own call.
+    """
+
+    def __init__(self, timeout=SINGLE_FLIGHT_TIMEOUT):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._futures = {}
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+        if not leader:
+            if not call.done.wait(self.timeout):
+                raise TimeoutError(f"In-flight query {key} timed out")
+            if call.error is not None:
+                raise call.error
+            return call.result
         try:
-            result = func(conn, *args, **kwargs)
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key, coro_fn):
+        loop = asyncio.get_running_loop()
+        joined = False
+        while True:
+            future = self._futures.get(key)
+            if future is None or future.get_loop() is not loop:
+                break
+            if not joined:
+                self.shared += 1
+                joined = True
+            try:
+                return await asyncio.wait_for(asyncio.shield(future),
+                                              self.timeout)
+            except _LeaderCancelled:
+                # Loop again: join a new leader or become it
+                continue
+        future = self._futures[key] = loop.create_future()
+        try:
+            result = await coro_fn()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled(key))
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved: there may be no waiters to consume it
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
             return result
-        except Exception as e:
-            raise e
         finally:
-            conn.close()
-    return wrapper
+            if self._futures.get(key) is future:
+                del self._futures[key]
+
+
+class SharedCache:
+    """Second cache tier in a SQLite file shared by local processes.
+
+    Values are stored as pickle protocol 5 blobs with an absolute expiry
+    time and the tables they read, so a write in any process can drop
+    them. Each thread keeps its own autocommit connection in WAL mode.
+    Every purge_every stores, expired rows are deleted and the rows
+    closest to expiry are dropped until at most max_entries remain.
+    Like QueryCache, the file keeps a generation per table, bumped by
+    invalidate_tables; set() given an older generation stores nothing,
+    whichever process committed the write.
+    """
+
+    def __init__(self, path=SHARED_CACHE_PATH, ttl=CACHE_TTL,
+                 max_entries=SHARED_CACHE_MAX_ENTRIES,
+                 purge_every=SHARED_CACHE_PURGE_EVERY):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._sets = 0
+        self.hits = 0
+        self.misses = 0
+        self.purged = 0
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " tables TEXT NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at "
+                     "ON cache (expires_at)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS generations ("
+            " table_name TEXT PRIMARY KEY,"
+            " n INTEGER NOT NULL)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key, default=None):
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?",
+            (key,)).fetchone()
+        if row is None or row[1] <= time.time():
+            self.misses += 1
+            return default
+        self.hits += 1
+        return pickle.loads(row[0])
+
+    def generation(self, tables):
+        return self._generation(self._conn(), tables)
+
+    def _generation(self, conn, tables):
+        tables = sorted(tables)
+        if not tables:
+            return 0
+        return conn.execute(
+            "SELECT COALESCE(SUM(n), 0) FROM generations WHERE table_name "
+            f"IN ({', '.join('?' * len(tables))})", tables).fetchone()[0]
+
+    def set(self, key, value, ttl=None, tables=(), generation=None):
+        """Store value; returns False if a write to `tables` committed
+        since `generation` was read."""
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        blob = pickle.dumps(value, protocol=5)
+        conn = self._conn()
+        # IMMEDIATE: the generation check and the insert must not
+        # interleave with another process's invalidate_tables
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if (generation is not None
+                    and generation != self._generation(conn, tables)):
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO cache "
+                "(key, value, expires_at, tables) VALUES (?, ?, ?, ?)",
+                (key, blob, expires_at, "," + ",".join(sorted(tables)) + ","))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._sets += 1
+        if self._sets % self.purge_every == 0:
+            self.purge()
+        return True
+
+    def invalidate_tables(self, tables):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table in tables:
+                conn.execute(
+                    "INSERT INTO generations (table_name, n) VALUES (?, 1) "
+                    "ON CONFLICT (table_name) DO UPDATE SET n = n + 1",
+                    (table,))
+                conn.execute("DELETE FROM cache WHERE tables LIKE ?",
+                             (f"%,{table},%",))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def purge(self):
+        """Delete expired rows, then trim the table to max_entries."""
+        conn = self._conn()
+        removed = conn.execute("DELETE FROM cache WHERE expires_at <= ?",
+                               (time.time(),)).rowcount
+        excess = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        excess -= self.max_entries
+        if excess > 0:
+            removed += conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache "
+                "ORDER BY expires_at LIMIT ?)", (excess,)).rowcount
+        self.purged += removed
+        return removed
+
+    def clear(self):
+        self._conn().execute("DELETE FROM cache")
+
+
+def normalize_sql(query):
+    """Collapse whitespace outside string literals and drop a trailing ;"""
+    parts = LITERAL_PATTERN.split(query)
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r"\s+", " ", parts[i])
+    return "".join(parts).strip().rstrip(";").rstrip()
+
+
+def read_tables(query):
+    """Return the lower-cased names of tables a query reads from."""
+    tables = set(JOIN_PATTERN.findall(query))
+    for from_list in FROM_PATTERN.findall(query):
+        for item in from_list.split(","):
+            match = TABLE_NAME.match(item)
+            if match:
+                tables.add(match.group(1))
+    return frozenset(t.lower() for t in tables)
+
+
+def make_cache_key(query, args=(), kwargs=None):
+    """Key on the normalized SQL plus the bound parameters."""
+    material = repr((normalize_sql(query), args,
+                     sorted((kwargs or {}).items())))
+    return hashlib.md5(material.encode()).hexdigest()
+
+
+# Global query cache, invalidated whenever a @transactional write
+# to one of its tables commits
+query_cache = QueryCache()
+transactional.on_commit(query_cache.invalidate_tables)
+in_flight = SingleFlight()
+
+# Optional second tier shared across processes; see enable_shared_cache
+shared_cache = None
+
+
+def enable_shared_cache(path=SHARED_CACHE_PATH, ttl=CACHE_TTL, **kwargs):
+    """Put a SharedCache behind query_cache.
+
+    Writes invalidate the shared tier for every process, but only the
+    in-process tier of the writing process, so keep query_cache.ttl
+    short when several processes write. Errors from the shared tier
+    are logged and otherwise ignored.
+    """
+    global shared_cache
+    shared_cache = SharedCache(path, ttl, **kwargs)
+    if _invalidate_shared not in transactional.commit_listeners:
+        transactional.on_commit(_invalidate_shared)
+    return shared_cache
+
+
+def _shared(method, *args, default=None):
+    # The shared tier is an optimization: a locked or broken file must
+    # not fail the query, nor a write that has already committed
+    try:
+        return getattr(shared_cache, method)(*args)
+    except Exception:
+        logger.warning("Shared query cache %s failed", method, exc_info=True)
+        return default
+
+
+def _invalidate_shared(tables):
+    if shared_cache is not None:
+        _shared("invalidate_tables", tables)
+
+
+def _generations(tables):
+    """Return the (local, shared) generations of `tables`; shared is
+    None without a usable shared tier."""
+    shared = None
+    if shared_cache is not None:
+        shared = _shared("generation", tables)
+    return query_cache.generation(tables), shared
+
+
+def _from_shared(cache_key, tables, generations):
+    if shared_cache is None:
+        return _MISSING
+    result = _shared("get", cache_key, _MISSING, default=_MISSING)
+    if result is not _MISSING:
+        query_cache.set(cache_key, result, tables=tables,
+                        generation=generations[0])
+    return result
+
+
+def _store(cache_key, result, tables, generations):
+    # Nothing is stored in a tier whose generation of `tables` moved
+    # since `generations` was read, i.e. a write committed meanwhile
+    local, shared = generations
+    stored = query_cache.set(cache_key, result, tables=tables,
+                             generation=local)
+    if stored and shared is not None:
+        _shared("set", cache_key, result, None, tables, shared)
 
 def cache_query(func):
-    """Decorator that caches query results based on the SQL query string."""
+    """Decorator that caches query results based on the SQL query string
+    and its parameters. Concurrent misses for the same key run the
+    query once (see SingleFlight); coroutine functions are supported.
+    With enable_shared_cache, misses are looked up in the shared tier
+    before the query runs. Calls made inside an open transaction bypass
+    the cache: they must see its uncommitted writes, and a rollback
+    would not invalidate what they stored."""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(conn, query, *args, **kwargs):
+            if conn.in_transaction:
+                return await func(conn, query, *args, **kwargs)
+            cache_key = make_cache_key(query, args, kwargs)
+            result = query_cache.get(cache_key, _MISSING)
+            if result is not _MISSING:
+                return result
+
+            async def load():
+                tables = read_tables(query)
+                if shared_cache is None:
+                    generations = _generations(tables)
+                else:
+                    generations = await asyncio.to_thread(_generations,
+                                                          tables)
+                result = query_cache.peek(cache_key, _MISSING)
+                if result is _MISSING and shared_cache is not None:
+                    result = await asyncio.to_thread(
+                        _from_shared, cache_key, tables, generations)
+                if result is _MISSING:
+                    result = await func(conn, query, *args, **kwargs)
+                    await asyncio.to_thread(_store, cache_key, result,
+                                            tables, generations)
+                return result
+
+            return await in_flight.do_async(cache_key, load)
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(conn, query, *args, **kwargs):
-        # Create a cache key from the query
-        cache_key = hashlib.md5(query.encode()).hexdigest()
+        if conn.in_transaction:
+            # Uncommitted data: never served from or stored in the cache
+            return func(conn, query, *args, **kwargs)
+
+        # Create a cache key from the query and its parameters
+        cache_key = make_cache_key(query, args, kwargs)
         
         # Check if result is in cache
-        if cache_key in query_cache:
+        result = query_cache.get(cache_key, _MISSING)
+        if result is not _MISSING:
             print(f"Using cached result for query: {query}")
-            return query_cache[cache_key]
-        
-        # If not in cache, execute the query and cache the result
-        print(f"Executing query and caching result: {query}")
-        result = func(conn, query, *args, **kwargs)
-        query_cache[cache_key] = result
-        
-        return result
+            return result
+
+        def load():
+            tables = read_tables(query)
+            # Taken before the query runs, so a write committing while it
+            # runs keeps the result out of the cache
+            generations = _generations(tables)
+            # A previous leader may have stored it since our lookup; peek
+            # so the miss is not counted twice
+            result = query_cache.peek(cache_key, _MISSING)
+            if result is _MISSING:
+                # Another process may have cached it in the shared tier
+                result = _from_shared(cache_key, tables, generations)
+            if result is _MISSING:
+                print(f"Executing query and caching result: {query}")
+                result = func(conn, query, *args, **kwargs)
+                _store(cache_key, result, tables, generations)
+            return result
+
+        # If not in cache, execute the query once for all waiting callers
+        return in_flight.do(cache_key, load)
     return wrapper
 
 @with_db_connection
 @cache_query
-def fetch_users_with_cache(conn, query):
+def fetch_users_with_cache(conn, query, params=()):
     cursor = conn.cursor()
-    cursor.execute(query)
+    cursor.execute(query, params)
     return cursor.fetchall()
 
 # Setup test database
@@ -84,3 +604,4 @@ if __name__ == "__main__":
     print("Different query:")
     specific_user = fetch_users_with_cache(query="SELECT * FROM users WHERE id = 1")
     print(f"Results: {specific_user}")
+    print(f"Cache stats: {query_cache.stats()}")
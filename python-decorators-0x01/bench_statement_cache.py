@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: per-call latency of a point lookup by id with a new
+connection per call (the old with_db_connection), one connection that
+re-parses the SQL every call (cached_statements=0), and a pooled
+connection, which reuses compiled statements via cached_statements.
+
+    python3 bench_statement_cache.py [calls]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+db = __import__('1-with_db_connection')
+
+QUERY = "SELECT * FROM users WHERE id = ?"
+
+
+def setup(path, rows=1000):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, "
+                  "email TEXT)")
+    conn.executemany("INSERT INTO users (name, email) VALUES (?, ?)",
+                     [(f"User {i}", f"user{i}@example.com")
+                      for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+
+def connect_per_call(path, user_id):
+    conn = sqlite3.connect(path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(QUERY, (user_id,))
+        return cursor.fetchone()
+    finally:
+        conn.close()
+
+
+_uncached = {}
+
+
+def reparse_each_call(path, user_id):
+    if path not in _uncached:
+        _uncached[path] = sqlite3.connect(path, cached_statements=0)
+    cursor = _uncached[path].cursor()
+    cursor.execute(QUERY, (user_id,))
+    return cursor.fetchone()
+
+
+def pooled(path, user_id):
+    with db.pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(QUERY, (user_id,))
+        return cursor.fetchone()
+
+
+def measure(func, path, calls):
+    start = time.perf_counter()
+    for i in range(calls):
+        func(path, i % 1000 + 1)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    setup(path)
+    db.configure_pool(database=path)
+    for func in (connect_per_call, reparse_each_call, pooled):
+        func(path, 1)  # warm up
+        print(f"{func.__name__:<20} {measure(func, path, calls):8.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
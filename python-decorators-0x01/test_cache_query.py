@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Test module for cache_query"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+db = __import__('1-with_db_connection')
+transactional = __import__('2-transactional')
+cache = __import__('4-cache_query')
+
+
+def make_users_db():
+    """Create a users table in a temporary file and return its path"""
+    path = os.path.join(tempfile.mkdtemp(), "users.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                 "name TEXT, email TEXT)")
+    conn.execute("INSERT INTO users VALUES (1, 'John Doe', "
+                 "'john@example.com')")
+    conn.commit()
+    conn.close()
+    return path
+
+
+class TestCacheQuery(unittest.TestCase):
+    """Test cases for cache_query invalidation"""
+
+    QUERY = "SELECT email FROM users WHERE id = ?"
+
+    def setUp(self):
+        """Point the pool at a fresh database and empty the cache"""
+        self.path = make_users_db()
+        db.configure_pool(database=self.path)
+        cache.query_cache.clear()
+        self.out = StringIO()
+        self.redirect = redirect_stdout(self.out)
+        self.redirect.__enter__()
+
+    def tearDown(self):
+        """Close the pool and remove the database"""
+        self.redirect.__exit__(None, None, None)
+        db.configure_pool()
+        shutil.rmtree(os.path.dirname(self.path))
+
+    def email(self):
+        return cache.fetch_users_with_cache(query=self.QUERY, params=(1,))
+
+    def test_commit_invalidates(self):
+        """A committed write drops cached reads of its table"""
+        self.assertEqual(self.email(), [("john@example.com",)])
+        transactional.update_user_email(user_id=1, new_email="new@x")
+        self.assertEqual(self.email(), [("new@x",)])
+
+    def test_rollback_is_not_cached(self):
+        """A read inside a rolled back transaction is not cached"""
+        @db.with_db_connection
+        @transactional.transactional
+        def write_then_fail(conn):
+            conn.execute("UPDATE users SET email = 'phantom' WHERE id = 1")
+            self.assertEqual(self.email(), [("phantom",)])
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            write_then_fail()
+        self.assertEqual(self.email(), [("john@example.com",)])
+
+    def test_batch_rollback_is_not_cached(self):
+        """A read inside a rolled back batch is not cached"""
+        with self.assertRaises(ValueError):
+            with transactional.batched_transactions():
+                transactional.update_user_email(user_id=1,
+                                                new_email="phantom")
+                self.assertEqual(self.email(), [("phantom",)])
+                raise ValueError("boom")
+        self.assertEqual(self.email(), [("john@example.com",)])
+
+    def test_stale_result_is_not_stored(self):
+        """A result read before a write committed is not stored"""
+        tables = cache.read_tables(self.QUERY)
+        generation = cache.query_cache.generation(tables)
+        cache.query_cache.invalidate_tables(tables)
+        self.assertFalse(cache.query_cache.set("key", 1, tables=tables,
+                                               generation=generation))
+        self.assertNotIn("key", cache.query_cache)
+
+    def test_miss_counted_once(self):
+        """A cold query counts one miss, a repeat one hit"""
+        before = cache.query_cache.stats()
+        self.email()
+        self.email()
+        after = cache.query_cache.stats()
+        self.assertEqual((after["misses"] - before["misses"],
+                          after["hits"] - before["hits"]), (1, 1))
+
+    def test_read_tables_comma_join(self):
+        """Every table of a comma join is found"""
+        self.assertEqual(
+            cache.read_tables("SELECT * FROM a x, b JOIN c ON 1"),
+            {"a", "b", "c"})
+
+
+class TestSharedCache(unittest.TestCase):
+    """Test cases for the shared cache tier"""
+
+    def setUp(self):
+        """Two SharedCache objects on one file act as two processes"""
+        self.dir = tempfile.mkdtemp()
+        path = os.path.join(self.dir, "cache.db")
+        self.reader = cache.SharedCache(path)
+        self.writer = cache.SharedCache(path)
+
+    def tearDown(self):
+        """Remove the cache file"""
+        shutil.rmtree(self.dir)
+
+    def test_invalidation_elsewhere_blocks_stale_store(self):
+        """A result read before another process's write is not stored"""
+        generation = self.reader.generation({"users"})
+        self.writer.invalidate_tables({"users"})
+        self.assertFalse(self.reader.set("key", "old", tables={"users"},
+                                         generation=generation))
+        self.assertIsNone(self.writer.get("key"))
+        generation = self.reader.generation({"users"})
+        self.assertTrue(self.reader.set("key", "new", tables={"users"},
+                                        generation=generation))
+        self.assertEqual(self.writer.get("key"), "new")
+
+    def test_invalidation_drops_entries(self):
+        """invalidate_tables removes entries that read the table"""
+        self.reader.set("key", 1, tables={"users", "orders"})
+        self.writer.invalidate_tables({"orders"})
+        self.assertIsNone(self.reader.get("key"))
+
+    def test_purge_bounds_entries(self):
+        """Stores purge expired rows and cap the row count"""
+        self.reader.max_entries = 5
+        self.reader.purge_every = 10
+        for i in range(10):
+            self.reader.set(f"old{i}", i, ttl=-1)
+        for i in range(10):
+            self.reader.set(f"new{i}", i)
+        count = self.reader._conn().execute(
+            "SELECT COUNT(*) FROM cache").fetchone()[0]
+        self.assertEqual(count, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
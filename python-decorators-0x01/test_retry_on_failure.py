@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Test module for retry_on_failure and CircuitBreaker"""
+
+import asyncio
+import sqlite3
+import time
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+retry = __import__('3-retry_on_failure')
+
+LOCKED = sqlite3.OperationalError("database is locked")
+
+
+class TestRetryOnFailure(unittest.TestCase):
+    """Test cases for retry_on_failure"""
+
+    def test_retries_must_be_positive(self):
+        """retries=0 is rejected instead of never calling func"""
+        with self.assertRaises(ValueError):
+            retry.retry_on_failure(retries=0)
+
+    def test_transient_error_is_retried(self):
+        """A transient error is retried until the call succeeds"""
+        calls = []
+
+        @retry.retry_on_failure(retries=3, delay=0)
+        def flaky():
+            calls.append(1)
+            if len(calls) < 2:
+                raise LOCKED
+            return "ok"
+
+        with redirect_stdout(StringIO()):
+            self.assertEqual(flaky(), "ok")
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(flaky.retry_stats["retries"], 1)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test cases for CircuitBreaker probes"""
+
+    def setUp(self):
+        """A breaker that opens on the first failure"""
+        self.breaker = retry.CircuitBreaker(min_calls=1, reset_timeout=0.01)
+
+    def open_circuit(self):
+        @self.breaker
+        def fail():
+            raise LOCKED
+        with self.assertRaises(sqlite3.OperationalError):
+            fail()
+        self.assertEqual(self.breaker.state, "open")
+        time.sleep(0.02)
+        self.assertEqual(self.breaker.state, "half-open")
+
+    def test_cancelled_probe_frees_its_slot(self):
+        """A probe cancelled by a timeout lets the next probe through"""
+        self.open_circuit()
+
+        @self.breaker
+        async def probe(seconds):
+            await asyncio.sleep(seconds)
+            return "ok"
+
+        async def run():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(probe(1), 0.01)
+            return await probe(0)
+
+        self.assertEqual(asyncio.run(run()), "ok")
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_late_call_does_not_decide_half_open(self):
+        """A call admitted while closed cannot close a half-open circuit"""
+        self.breaker._before_call()
+        self.open_circuit()
+        self.breaker._record(False, None)
+        self.assertEqual(self.breaker.state, "half-open")
+
+
+if __name__ == "__main__":
+    unittest.main()
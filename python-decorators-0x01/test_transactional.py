@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Test module for transactional and batched_transactions"""
+
+import asyncio
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+db = __import__('1-with_db_connection')
+transactional = __import__('2-transactional')
+
+
+class TestTransactional(unittest.TestCase):
+    """Test cases for savepoint nesting and batching"""
+
+    def setUp(self):
+        """Point the pool at a fresh database with two users"""
+        self.path = os.path.join(tempfile.mkdtemp(), "users.db")
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                     "name TEXT, email TEXT)")
+        conn.executemany("INSERT INTO users VALUES (?, ?, ?)",
+                         [(1, "John", "john@x"), (2, "Jane", "jane@x")])
+        conn.commit()
+        conn.close()
+        db.configure_pool(database=self.path)
+        self.async_pool = db.async_pool
+        db.async_pool = db.AsyncSQLitePool(database=self.path, timeout=2)
+        self.committed = []
+        transactional.on_commit(self.committed.append)
+        self.redirect = redirect_stdout(StringIO())
+        self.redirect.__enter__()
+
+    def tearDown(self):
+        """Close the pool and remove the database"""
+        self.redirect.__exit__(None, None, None)
+        transactional.commit_listeners.remove(self.committed.append)
+        db.configure_pool()
+        db.async_pool = self.async_pool
+        shutil.rmtree(os.path.dirname(self.path))
+
+    def emails(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            return [row[0] for row in
+                    conn.execute("SELECT email FROM users ORDER BY id")]
+        finally:
+            conn.close()
+
+    def test_outer_rollback_undoes_nested_call(self):
+        """A nested call does not commit the outer call's work"""
+        @db.with_db_connection
+        @transactional.transactional
+        def outer(conn):
+            conn.execute("UPDATE users SET email = 'outer' WHERE id = 2")
+            transactional.update_user_email(user_id=1, new_email="inner")
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            outer()
+        self.assertEqual(self.emails(), ["john@x", "jane@x"])
+        self.assertEqual(self.committed, [])
+
+    def test_nested_failure_rolls_back_only_itself(self):
+        """A caught nested failure keeps the outer call's work"""
+        @db.with_db_connection
+        @transactional.transactional
+        def inner(conn):
+            conn.execute("UPDATE users SET email = 'bad' WHERE id = 1")
+            raise KeyError("inner")
+
+        @db.with_db_connection
+        @transactional.transactional
+        def outer(conn):
+            conn.execute("UPDATE users SET email = 'outer' WHERE id = 2")
+            with self.assertRaises(KeyError):
+                inner()
+
+        outer()
+        self.assertEqual(self.emails(), ["john@x", "outer"])
+        self.assertEqual(self.committed, [{"users"}])
+
+    def test_batch_commits_every_flush_size(self):
+        """A batch commits every flush_size calls and on exit"""
+        with transactional.batched_transactions(flush_size=2) as batch:
+            for user_id in (1, 2, 1):
+                transactional.update_user_email(user_id=user_id,
+                                                new_email=f"b{user_id}")
+        self.assertEqual(batch.commits, 2)
+        self.assertEqual(self.emails(), ["b1", "b2"])
+
+    def test_batch_failure_rolls_back_one_call(self):
+        """A failing call in a batch leaves the other calls pending"""
+        @db.with_db_connection
+        @transactional.transactional
+        def fail(conn):
+            conn.execute("UPDATE users SET email = 'bad' WHERE id = 2")
+            raise KeyError("fail")
+
+        with transactional.batched_transactions():
+            transactional.update_user_email(user_id=1, new_email="kept")
+            with self.assertRaises(KeyError):
+                fail()
+        self.assertEqual(self.emails(), ["kept", "jane@x"])
+
+    def test_batch_exception_rolls_back_everything(self):
+        """An exception escaping the scope rolls back pending calls"""
+        with self.assertRaises(ValueError):
+            with transactional.batched_transactions():
+                transactional.update_user_email(user_id=1, new_email="x")
+                raise ValueError("boom")
+        self.assertEqual(self.emails(), ["john@x", "jane@x"])
+
+    def test_async_nested_call_shares_connection(self):
+        """A nested async call joins the outer transaction"""
+        @db.with_db_connection
+        @transactional.transactional
+        async def outer(conn, fail):
+            await conn.execute("UPDATE users SET email = 'outer' "
+                               "WHERE id = 2")
+            await transactional.update_user_email_async(user_id=1,
+                                                        new_email="inner")
+            if fail:
+                raise ValueError("boom")
+
+        async def run():
+            with self.assertRaises(ValueError):
+                await outer(fail=True)
+            self.assertEqual(self.emails(), ["john@x", "jane@x"])
+            await outer(fail=False)
+            await db.async_pool.close()
+
+        asyncio.run(run())
+        self.assertEqual(self.emails(), ["inner", "outer"])
+        self.assertEqual(self.committed, [{"users"}])
+        self.assertEqual(db.async_pool.stats["created"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
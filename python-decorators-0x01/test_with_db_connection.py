@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Test module for BatchLoader and the batched user lookups"""
+
+import asyncio
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+db = __import__('1-with_db_connection')
+
+
+class TestBatchLoader(unittest.TestCase):
+    """Test cases for BatchLoader batching and fan-out"""
+
+    def setUp(self):
+        """A loader over a fake bulk fetch that records its calls"""
+        self.calls = []
+
+        def fetch(keys):
+            self.calls.append(list(keys))
+            if "bad" in keys:
+                raise KeyError("bad")
+            return [(key, f"user {key}") for key in keys if key != 404]
+
+        self.loader = db.BatchLoader(fetch, key_of=lambda row: row[0],
+                                     max_batch=3)
+
+    def test_loads_collapse_into_chunks(self):
+        """Queued keys are fetched once, deduplicated, in chunks"""
+        pending = [self.loader.load(key) for key in (1, 2, 1, 3, 4)]
+        self.assertIs(pending[0], pending[2])
+        self.assertEqual([p.result() for p in pending],
+                         [(1, "user 1"), (2, "user 2"), (1, "user 1"),
+                          (3, "user 3"), (4, "user 4")])
+        self.assertEqual(self.calls, [[1, 2, 3], [4]])
+        self.assertEqual((self.loader.batches, self.loader.keys_loaded),
+                         (2, 4))
+
+    def test_missing_key_is_none(self):
+        """A key without a row resolves to None"""
+        self.assertEqual(self.loader.load_many([1, 404]),
+                         [(1, "user 1"), None])
+
+    def test_error_fans_out_to_its_chunk(self):
+        """A failing chunk fails its keys only"""
+        pending = [self.loader.load(key) for key in (1, 2, "bad", 4)]
+        for p in pending[:3]:
+            with self.assertRaises(KeyError):
+                p.result()
+        self.assertEqual(pending[3].result(), (4, "user 4"))
+
+    def test_batch_scope_dispatches_on_exit(self):
+        """batch() fetches whatever is queued when it exits"""
+        with self.loader.batch():
+            pending = self.loader.load(1)
+        self.assertTrue(pending.done())
+
+    def test_result_on_another_thread(self):
+        """A Pending made on one thread resolves on another"""
+        pending = []
+        thread = threading.Thread(
+            target=lambda: pending.extend(self.loader.load(k)
+                                          for k in (1, 2)))
+        thread.start()
+        thread.join()
+        self.assertEqual([p.result() for p in pending],
+                         [(1, "user 1"), (2, "user 2")])
+        self.assertEqual(self.calls, [[1, 2]])
+
+    def test_concurrent_results_share_one_fetch(self):
+        """Threads resolving one batch run a single fetch"""
+        pending = [self.loader.load(key) for key in (1, 2)]
+        results = []
+        threads = [threading.Thread(
+            target=lambda: results.append([p.result() for p in pending]))
+            for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 8)
+        self.assertEqual(self.calls, [[1, 2]])
+
+    def test_load_after_dispatch_starts_new_batch(self):
+        """Keys loaded after a dispatch go into a new batch"""
+        first = self.loader.load(1)
+        first.result()
+        self.assertIsNot(self.loader.load(1), first)
+
+
+class TestAsyncBatchLoader(unittest.TestCase):
+    """Test cases for BatchLoader.aload"""
+
+    def test_awaits_in_one_iteration_share_a_fetch(self):
+        """aload calls gathered together run one fetch"""
+        calls = []
+
+        async def fetch(keys):
+            calls.append(list(keys))
+            return [(key,) for key in keys]
+
+        loader = db.BatchLoader(fetch, key_of=lambda row: row[0])
+
+        async def run():
+            first = await asyncio.gather(*(loader.aload(k)
+                                           for k in (1, 2, 1)))
+            second = await loader.aload(3)
+            return first, second
+
+        self.assertEqual(asyncio.run(run()), ([(1,), (2,), (1,)], (3,)))
+        self.assertEqual(calls, [[1, 2], [3]])
+
+
+class TestGetUsersByIds(unittest.TestCase):
+    """Test cases for get_users_by_ids against SQLite"""
+
+    def setUp(self):
+        """Point the pool at a database with five users"""
+        self.dir = tempfile.mkdtemp()
+        path = os.path.join(self.dir, "users.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                     "name TEXT, email TEXT)")
+        conn.executemany("INSERT INTO users VALUES (?, ?, ?)",
+                         [(i, f"User {i}", f"u{i}@x") for i in range(1, 6)])
+        conn.commit()
+        conn.close()
+        db.configure_pool(database=path)
+
+    def tearDown(self):
+        """Close the pool and remove the database"""
+        db.configure_pool()
+        shutil.rmtree(self.dir)
+
+    def test_in_clause_pads_to_power_of_two(self):
+        """IN lists are padded so few distinct SQL texts exist"""
+        placeholders, params = db.in_clause([1, 2, 3])
+        self.assertEqual(placeholders, "?, ?, ?, ?")
+        self.assertEqual(params, [1, 2, 3, 3])
+
+    def test_lookups_use_one_query(self):
+        """Point lookups come back in order from one IN query"""
+        before = db.get_users_by_ids.batches
+        rows = db.get_users_by_ids.load_many([3, 1, 9])
+        self.assertEqual([row and row[0] for row in rows], [3, 1, None])
+        self.assertEqual(db.get_users_by_ids.batches - before, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
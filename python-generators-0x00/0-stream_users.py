@@ -1,8 +1,19 @@
 #!/usr/bin/python3
-def stream_users():
-    from itertools import islice
-    stream_users = __import__('0-stream_users')
+from itertools import islice
+seed = __import__('seed')
 
 
+def stream_users(prefetch=seed.PREFETCH):
+    """
+    Generator: yields users one by one from user_data.
+    Rows are pulled from an unbuffered cursor `prefetch` at a time.
+    """
+    yield from seed.stream_query(
+        "SELECT user_id, name, email, age FROM user_data",
+        batch_size=prefetch
+    )
+
+
+if __name__ == "__main__":
     for user in islice(stream_users(), 6):
         print(user)
@@ -1,40 +1,46 @@
 #!/usr/bin/python3
 import sys
-processing = __import__('1-batch_processing')
+seed = __import__('seed')
 
-##### print processed users in a batch of 50
-try:
-    processing.batch_processing(50)
-except BrokenPipeError:
-    sys.stderr.close()
 
+COLUMNS = ("user_id", "name", "email", "age")
 
-def stream_users_in_batches(batch_size):
-   
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute(f"SELECT user_id, name, email, age FROM user_data")
+
+def stream_users_in_batches(batch_size, filters=None, columnar=False,
+                            columns=COLUMNS, checkpoint=None):
+    """
+    Generator: yields lists of up to batch_size users from an
+    unbuffered cursor, so only one batch is held in memory.
+    `filters` are pushed into the WHERE clause (see seed.compile_filters).
+    With columnar=True each batch is a dict of columns instead
+    (see seed.to_columns). A seed.Checkpoint makes the scan resumable.
+    """
+    if checkpoint is not None:
+        batches = seed.stream_checkpointed(columns, checkpoint, filters,
+                                           batch_size=batch_size)
+    else:
+        batches = seed.stream_filtered(columns, filters, batch_size)
     # Loop #1: batch-fetch rows
-    while True:
-        batch = cursor.fetchmany(batch_size)
-        if not batch:
-            break
-        yield batch
-    cursor.close()
-    conn.close()
- return (total, count)
-def batch_processing(batch_size):
+    for batch in batches:
+        yield seed.to_columns(batch, columns) if columnar else batch
+
+
+def batch_processing(batch_size, min_age=25, checkpoint=None):
     """
-    Generator: filters users over age 25 from each batch.
+    Generator: yields users over min_age; the age filter runs in SQL.
+    Pass a seed.Checkpoint to resume an interrupted scan.
     """
     # Loop #2: iterate batches
-    for batch in stream_users_in_batches(batch_size):
+    for batch in stream_users_in_batches(batch_size, [("age", ">", min_age)],
+                                         checkpoint=checkpoint):
         # Loop #3: iterate rows in batch
-        for user in batch:
-            if user['age'] > 25:  # includes "25" and ">"
-                yield user
-
-if __name__ == "__main__":
-    for user in batch_processing(batch_size=50):
-        print(user)
+        yield from batch
 
 
+if __name__ == "__main__":
+    ##### print processed users in a batch of 50
+    try:
+        for user in batch_processing(batch_size=50):
+            print(user)
+    except BrokenPipeError:
+        sys.stderr.close()
@@ -4,21 +4,61 @@ seed = __import__('seed')
 
 
 def paginate_users(page_size, offset):
-    connection = seed.connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute(f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}")
+    with seed.get_pool().connection() as connection:
+        cursor = seed.open_cursor(connection, dictionary=True)
+        cursor.execute(f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}")
+        rows = cursor.fetchall()
+        cursor.close()
+    return rows
+
+
+def paginate_users_after(connection, page_size, last_key=None, key="user_id"):
+    """
+    Fetch the page that follows `last_key` in `key` order.
+
+    Seeks on the index instead of skipping OFFSET rows, so every page
+    costs the same no matter how deep into the table it is.
+    """
+    if not key.isidentifier():
+        raise ValueError(f"Invalid key column: {key!r}")
+    cursor = seed.open_cursor(connection, dictionary=True)
+    if last_key is None:
+        cursor.execute(seed.dialect_sql(
+            connection, f"SELECT * FROM user_data ORDER BY {key} LIMIT %s"
+        ), (page_size,))
+    else:
+        cursor.execute(seed.dialect_sql(
+            connection,
+            f"SELECT * FROM user_data WHERE {key} > %s ORDER BY {key} LIMIT %s"
+        ), (last_key, page_size))
     rows = cursor.fetchall()
-    connection.close()
+    cursor.close()
     return rows
 
-import sys
-lazy_paginator = __import__('2-lazy_paginate').lazy_pagination
+
+def lazy_pagination(page_size, key="user_id"):
+    """
+    Generator: lazily yields pages of users using keyset pagination
+    over one pooled connection. `key` must be a unique, indexed column.
+    """
+    with seed.get_pool().connection() as connection:
+        last_key = None
+        # Loop #1: fetch the next page only when it is needed
+        while True:
+            page = paginate_users_after(connection, page_size, last_key, key)
+            if not page:
+                break
+            yield page
+            if len(page) < page_size:
+                break
+            last_key = page[-1][key]
 
 
-try:
-    for page in lazy_paginator(100):
-        for user in page:
-            print(user)
+if __name__ == "__main__":
+    try:
+        for page in lazy_pagination(100):
+            for user in page:
+                print(user)
 
-except BrokenPipeError:
-    sys.stderr.close()
+    except BrokenPipeError:
+        sys.stderr.close()
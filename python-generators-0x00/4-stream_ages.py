@@ -1,30 +1,127 @@
 #!/usr/bin/env python3
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
 seed = __import__('seed')
 
 
 def stream_user_ages():
-    
-    cursor = conn.cursor()
-    cursor.execute(f"SELECT age FROM user_data")
-    # Loop #1: fetch rows lazily using cursor iteration
-    for (age,) in cursor:
+    """Generator: yields user ages one by one."""
+    # Loop #1: fetch rows lazily from an unbuffered cursor
+    for (age,) in seed.stream_query("SELECT age FROM user_data",
+                                    dictionary=False):
         yield age
-    cursor.close()
-    conn.close()
 
-def compute_average_age():
-    
+
+def stream_age_columns(batch_size=seed.PREFETCH):
+    """Generator: yields ages as float64 columns of up to batch_size."""
+    for batch in seed.stream_batches("SELECT age FROM user_data",
+                                     batch_size=batch_size):
+        yield seed.to_columns(batch, ("age",))["age"]
+
+
+def filter_ages(ages, min_age):
+    """Return the ages in a column that are greater than min_age."""
+    if seed.np is not None:
+        return ages[ages > min_age]
+    return type(ages)("d", (age for age in ages if age > min_age))
+
+
+def compute_average_age_columnar(batch_size=seed.PREFETCH):
+    """Average age computed one column at a time instead of per row."""
     total = 0.0
     count = 0
+    for ages in stream_age_columns(batch_size):
+        total += float(ages.sum()) if seed.np is not None else math.fsum(ages)
+        count += len(ages)
+    return total / count if count else 0
+
+
+def partial_age_stats(low, high, bucket_width=10,
+                      connect=seed.connect_to_prodev):
+    """
+    Stream the ages of one user_id range over its own connection and
+    return count, exact Decimal sum, min, max and a histogram.
+    """
+    stats = {"count": 0, "sum": Decimal(0), "min": None, "max": None,
+             "histogram": {}}
+    conn = connect()
+    try:
+        for batch in seed.stream_filtered(("age",),
+                                          seed.range_filters(low, high),
+                                          conn=conn):
+            for row in batch:
+                age = Decimal(str(row["age"]))
+                stats["count"] += 1
+                stats["sum"] += age
+                if stats["min"] is None or age < stats["min"]:
+                    stats["min"] = age
+                if stats["max"] is None or age > stats["max"]:
+                    stats["max"] = age
+                bucket = math.floor(age / bucket_width) * bucket_width
+                histogram = stats["histogram"]
+                histogram[bucket] = histogram.get(bucket, 0) + 1
+    finally:
+        conn.close()
+    return stats
+
 
-    for age in stream_user_ages():
-        total += age
-        count += 1
+def merge_age_stats(parts):
+    """Combine partial_age_stats results; the result is exact."""
+    merged = {"count": 0, "sum": Decimal(0), "min": None, "max": None,
+              "histogram": {}}
+    for part in parts:
+        merged["count"] += part["count"]
+        merged["sum"] += part["sum"]
+        for name, pick in (("min", min), ("max", max)):
+            values = [v for v in (merged[name], part[name]) if v is not None]
+            merged[name] = pick(values) if values else None
+        histogram = merged["histogram"]
+        for bucket, count in part["histogram"].items():
+            histogram[bucket] = histogram.get(bucket, 0) + count
+    merged["histogram"] = dict(sorted(merged["histogram"].items()))
+    merged["avg"] = merged["sum"] / merged["count"] if merged["count"] else None
+    return merged
 
-    average = total / count if count else 0
+
+def parallel_age_stats(workers=None, bucket_width=10,
+                       connect=seed.connect_to_prodev):
+    """
+    Map-reduce the age statistics: one user_id range per worker process,
+    each with its own connection, merged with merge_age_stats.
+    `connect` must be picklable.
+    """
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(partial_age_stats, low, high, bucket_width,
+                               connect)
+                   for low, high in seed.key_ranges(workers)]
+        return merge_age_stats(f.result() for f in futures)
+
+
+def compute_average_age(pushdown=True, workers=1):
+    """
+    Print the average user age. With pushdown the database computes
+    AVG(age); with workers > 1 the ages are aggregated in parallel
+    (see parallel_age_stats); otherwise every age is streamed here.
+    """
+    if workers > 1:
+        average = parallel_age_stats(workers)["avg"] or 0
+    elif pushdown:
+        average = seed.aggregate("age", ("avg",))["avg"] or 0
+    else:
+        total = 0.0
+        count = 0
+
+        for age in stream_user_ages():
+            # MySQL returns DECIMAL ages as Decimal
+            total += float(age)
+            count += 1
+
+        average = total / count if count else 0
     print(f"Average age of users: {average}")
 
+
 if __name__ == "__main__":
     compute_average_age()
-
-   
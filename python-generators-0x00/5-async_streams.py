@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+import asyncio
+seed = __import__('seed')
+
+try:
+    import aiomysql
+except ImportError:  # fall back to aiosqlite
+    aiomysql = None
+
+try:
+    import aiosqlite
+except ImportError:
+    aiosqlite = None
+
+# Local SQLite file streamed with aiosqlite when aiomysql is missing
+# or SQLITE_PATH is set explicitly.
+SQLITE_PATH = None
+DEFAULT_SQLITE_PATH = "ALX_prodev.db"
+MAX_CONCURRENCY = 4
+
+
+def _use_sqlite():
+    return SQLITE_PATH is not None or aiomysql is None
+
+
+async def connect_async():
+    """Open a non-blocking connection to user_data."""
+    if _use_sqlite():
+        if aiosqlite is None:
+            raise ImportError("aiosqlite or aiomysql is required")
+        conn = await aiosqlite.connect(SQLITE_PATH or DEFAULT_SQLITE_PATH)
+        conn.row_factory = seed._dict_row
+        return conn
+    return await aiomysql.connect(host=seed.HOST, user=seed.USER,
+                                  password=seed.PASSWORD, db=seed.DB_NAME)
+
+
+async def _close(conn):
+    if _use_sqlite():
+        await conn.close()
+    else:
+        conn.close()
+
+
+async def _execute(conn, sql, params=None):
+    if _use_sqlite():
+        return await conn.execute(sql.replace("%s", "?"), params or ())
+    # Server-side cursor: rows stay on the server until fetched
+    cursor = await conn.cursor(aiomysql.SSDictCursor)
+    await cursor.execute(sql, params)
+    return cursor
+
+
+async def stream_batches(sql, params=None, batch_size=seed.PREFETCH):
+    """Async generator: yields lists of up to batch_size dict rows,
+    on a connection of its own."""
+    conn = await connect_async()
+    try:
+        cursor = await _execute(conn, sql, params)
+        try:
+            while True:
+                batch = await cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield batch
+        finally:
+            await cursor.close()
+    finally:
+        await _close(conn)
+
+
+async def stream_users():
+    """Async generator: yields users one by one."""
+    async for batch in stream_batches(
+            "SELECT user_id, name, email, age FROM user_data"):
+        for user in batch:
+            yield user
+
+
+async def stream_users_in_batches(batch_size):
+    """Async generator: yields lists of up to batch_size users."""
+    async for batch in stream_batches(
+            "SELECT user_id, name, email, age FROM user_data",
+            batch_size=batch_size):
+        yield batch
+
+
+async def lazy_pagination(page_size, key="user_id"):
+    """Async generator: yields pages using keyset pagination over `key`
+    on one connection."""
+    if not key.isidentifier():
+        raise ValueError(f"Invalid key column: {key!r}")
+    conn = await connect_async()
+    try:
+        last_key = None
+        while True:
+            if last_key is None:
+                sql = f"SELECT * FROM user_data ORDER BY {key} LIMIT %s"
+                params = (page_size,)
+            else:
+                sql = (f"SELECT * FROM user_data WHERE {key} > %s "
+                       f"ORDER BY {key} LIMIT %s")
+                params = (last_key, page_size)
+            cursor = await _execute(conn, sql, params)
+            page = await cursor.fetchall()
+            await cursor.close()
+            if not page:
+                break
+            yield page
+            if len(page) < page_size:
+                break
+            last_key = page[-1][key]
+    finally:
+        await _close(conn)
+
+
+async def stream_user_ages():
+    """Async generator: yields user ages one by one."""
+    async for batch in stream_batches("SELECT age FROM user_data"):
+        for row in batch:
+            yield row["age"]
+
+
+async def run_bounded(coroutines, limit=MAX_CONCURRENCY):
+    """Await coroutines concurrently, at most `limit` at a time, so
+    several streams can be consumed in parallel without opening a
+    connection per stream all at once."""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*(run(c) for c in coroutines))
+
+
+async def main():
+    async def average_age():
+        total = 0.0
+        count = 0
+        async for age in stream_user_ages():
+            total += float(age)
+            count += 1
+        return total / count if count else 0
+
+    async def count_pages():
+        return sum([1 async for _ in lazy_pagination(100)])
+
+    average, pages = await run_bounded([average_age(), count_pages()])
+    print(f"Average age of users: {average}")
+    print(f"Pages of 100 users: {pages}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Benchmark the user_data generators against a local SQLite stand-in.
+
+Seeds ALX_prodev_<rows>.db once per size, then runs every case in a
+fresh process and records rows/sec, time-to-first-row, peak RSS and
+round trips (cursor execute/fetch calls). Results are written as JSON
+so runs can be diffed across versions:
+
+    ./benchmark.py --rows 10000 1000000 --output bench.json
+"""
+import argparse
+import contextlib
+import functools
+import io
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import random
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+
+# The shared seed module lives at the repository root
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.dirname(HERE), HERE]
+seed = __import__('seed')
+
+ROUND_TRIPS = [0]
+BATCH_SIZE = 1000
+CASE_TIMEOUT = 3600  # seconds before a case is killed
+
+
+class CountingCursor(sqlite3.Cursor):
+    def execute(self, *args):
+        ROUND_TRIPS[0] += 1
+        return super().execute(*args)
+
+    def executemany(self, *args):
+        ROUND_TRIPS[0] += 1
+        return super().executemany(*args)
+
+    def fetchone(self):
+        ROUND_TRIPS[0] += 1
+        return super().fetchone()
+
+    def fetchmany(self, *args):
+        ROUND_TRIPS[0] += 1
+        return super().fetchmany(*args)
+
+    def fetchall(self):
+        ROUND_TRIPS[0] += 1
+        return super().fetchall()
+
+
+class CountingConnection(sqlite3.Connection):
+    def cursor(self, factory=CountingCursor):
+        return super().cursor(factory)
+
+
+def connect(path):
+    return sqlite3.connect(path, factory=CountingConnection,
+                           check_same_thread=False)
+
+
+class TallyConnection(CountingConnection):
+    def close(self):
+        super().close()
+        with open(self.tally, "a") as f:
+            f.write(f"{ROUND_TRIPS[0]}\n")
+
+
+class TallyConnect:
+    """Picklable connect for worker processes: each connection counts
+    its round trips and appends them to the `tally` file on close."""
+
+    def __init__(self, path, tally):
+        self.path = path
+        self.tally = tally
+
+    def __call__(self):
+        ROUND_TRIPS[0] = 0
+        conn = sqlite3.connect(self.path, factory=TallyConnection)
+        conn.tally = self.tally
+        return conn
+
+
+def seed_database(path, rows):
+    """Create and fill user_data with `rows` synthetic users."""
+    conn = sqlite3.connect(path)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {seed.TABLE_NAME} (
+            user_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL UNIQUE,
+            age REAL NOT NULL
+        )
+    """)
+    rng = random.Random(rows)
+    data = ({"name": f"User {i}", "email": f"user{i}@example.com",
+             "age": rng.randint(18, 90)} for i in range(rows))
+    seed.bulk_insert_data(conn, data, chunk_size=10000, verbose=False)
+    conn.close()
+
+
+def module(name):
+    return __import__(name)
+
+
+def case_stream_users():
+    return module('0-stream_users').stream_users()
+
+
+def case_batch_processing():
+    return module('1-batch_processing').batch_processing(BATCH_SIZE)
+
+
+def case_batch_processing_checkpointed():
+    # Save about ten times whatever the table size
+    every = max(1, case_batch_processing_checkpointed.table_rows
+                // (BATCH_SIZE * 10))
+    checkpoint = seed.Checkpoint(os.path.join(tempfile.mkdtemp(), "ck.json"),
+                                 every=every)
+    gen = module('1-batch_processing').batch_processing(BATCH_SIZE,
+                                                        checkpoint=checkpoint)
+    for row in gen:
+        yield row
+    case_batch_processing_checkpointed.extra = {
+        "checkpoint_every": every,
+        "checkpoint_saves": checkpoint.saves,
+        "checkpoint_seconds": checkpoint.save_seconds,
+    }
+
+
+def case_lazy_pagination():
+    for page in module('2-lazy_paginate').lazy_pagination(BATCH_SIZE):
+        yield from page
+
+
+def case_stream_user_ages():
+    return module('4-stream_ages').stream_user_ages()
+
+
+def _average(**kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        module('4-stream_ages').compute_average_age(**kwargs)
+    yield 1
+
+
+def case_compute_average_age_pushdown():
+    return _average(pushdown=True)
+
+
+def case_compute_average_age_streaming():
+    return _average(pushdown=False)
+
+
+def case_compute_average_age_columnar():
+    module('4-stream_ages').compute_average_age_columnar()
+    yield 1
+
+
+def case_parallel_age_stats():
+    workers = os.cpu_count() or 1
+    tally = os.path.join(tempfile.mkdtemp(), "round_trips")
+    module('4-stream_ages').parallel_age_stats(
+        workers, connect=TallyConnect(case_parallel_age_stats.path, tally))
+    # Round trips happen in the workers; add up what they reported
+    with open(tally) as f:
+        ROUND_TRIPS[0] += sum(int(line) for line in f)
+    case_parallel_age_stats.extra = {"workers": workers}
+    yield 1
+
+
+CASES = {name[len("case_"):]: func for name, func in sorted(globals().items())
+         if name.startswith("case_")}
+
+
+def measure(name, path, size, results):
+    """Run one case in this (fresh) process and report through `results`."""
+    seed.configure_pool(connect=functools.partial(connect, path))
+    func = CASES[name]
+    func.path = path
+    func.table_rows = size
+    func.extra = {}
+    ROUND_TRIPS[0] = 0
+    start = time.perf_counter()
+    first = None
+    rows = 0
+    for _ in func():
+        if first is None:
+            first = time.perf_counter() - start
+        rows += 1
+    elapsed = time.perf_counter() - start
+    results.put({
+        "case": name,
+        "rows": rows,
+        "seconds": elapsed,
+        "rows_per_sec": rows / elapsed if elapsed else None,
+        "time_to_first_row": first,
+        # ru_maxrss is KiB on Linux; for children it is the largest
+        # single worker, not their sum
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "peak_rss_children_kb":
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        "round_trips": ROUND_TRIPS[0],
+        **func.extra,
+    })
+
+
+def collect(proc, results, timeout):
+    """Wait for the result of `proc`, or describe how it failed."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return results.get(timeout=1)
+        except queue.Empty:
+            pass
+        if proc.exitcode is not None:
+            try:
+                return results.get_nowait()
+            except queue.Empty:
+                return {"error": f"exited with code {proc.exitcode}"}
+        if time.monotonic() > deadline:
+            proc.terminate()
+            return {"error": f"timed out after {timeout}s"}
+
+
+def run(sizes, cases, db_dir, timeout=CASE_TIMEOUT):
+    ctx = multiprocessing.get_context("fork")
+    results = []
+    for size in sizes:
+        path = os.path.join(db_dir, f"ALX_prodev_{size}.db")
+        if not os.path.exists(path):
+            print(f"Seeding {size} rows into {path}", file=sys.stderr)
+            seed_database(path, size)
+        for name in cases:
+            channel = ctx.Queue()
+            proc = ctx.Process(target=measure,
+                               args=(name, path, size, channel))
+            proc.start()
+            result = collect(proc, channel, timeout)
+            proc.join()
+            result.update(case=name, table_rows=size)
+            if "error" in result:
+                outcome = f"FAILED: {result['error']}"
+            else:
+                outcome = f"{result['seconds']:8.3f}s"
+            print(f"{size:>10} {name:<36} {outcome}", file=sys.stderr)
+            results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000],
+                        help="table sizes, e.g. 10000 1000000 10000000")
+    parser.add_argument("--case", choices=sorted(CASES), nargs="+",
+                        default=sorted(CASES))
+    parser.add_argument("--db-dir", default=".")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--timeout", type=float, default=CASE_TIMEOUT,
+                        help="seconds before a case is killed")
+    args = parser.parse_args()
+
+    report = {
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": run(args.rows, args.case, args.db_dir, args.timeout),
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,39 @@
 #!/usr/bin/env python3
+import os
+import sys
 import uuid
 import csv
+import json
+import math
+import time
+import sqlite3
+import queue
+import threading
+from array import array
+from contextlib import contextmanager
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
 import mysql.connector
 from mysql.connector import errorcode
 
+try:
+    import numpy as np
+except ImportError:  # columnar batches fall back to array.array
+    np = None
+
 HOST = "localhost"
 USER = "root"
 PASSWORD = ""  # or your password
 DB_NAME = "ALX_prodev"
 TABLE_NAME = "user_data"
 CSV_FILE = "user_data.csv"
+BATCH_SIZE = 1000
+QUEUE_DEPTH = 4
+PREFETCH = 500
+UUID_WIDTH = 36
+POOL_SIZE = 5
+POOL_IDLE_TIMEOUT = 300
+CHECKPOINT_EVERY = 10
 
 def connect_db():
     return mysql.connector.connect(
@@ -27,6 +51,415 @@ def connect_to_prodev():
         host=HOST, user=USER, password=PASSWORD, database=DB_NAME
     )
 
+def is_sqlite(conn):
+    return isinstance(conn, sqlite3.Connection)
+
+def dialect_sql(conn, stmt):
+    """Rewrite a MySQL statement for SQLite stand-in connections."""
+    if not is_sqlite(conn):
+        return stmt
+    return stmt.replace("INSERT IGNORE", "INSERT OR IGNORE").replace("%s", "?")
+
+def is_alive(conn):
+    """Cheap health check used before handing out a pooled connection."""
+    if is_sqlite(conn):
+        try:
+            conn.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+    return conn.is_connected()
+
+class ConnectionPool:
+    """Thread-safe pool of connections made by `connect`.
+
+    Idle connections are reused most-recent first, checked with
+    is_alive before reuse and closed once idle for idle_timeout seconds.
+    acquire blocks while max_size connections are checked out.
+    """
+
+    def __init__(self, connect=connect_to_prodev, max_size=POOL_SIZE,
+                 idle_timeout=POOL_IDLE_TIMEOUT):
+        self.connect = connect
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.pid = os.getpid()
+        self._idle = []
+        self._size = 0
+        self._cond = threading.Condition()
+        self.stats = {"created": 0, "reused": 0, "discarded": 0,
+                      "waits": 0}
+
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            conn = None
+            with self._cond:
+                if not self._idle and self._size >= self.max_size:
+                    self.stats["waits"] += 1
+                while not self._idle and self._size >= self.max_size:
+                    remaining = None
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise TimeoutError("No pooled connection available")
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                else:
+                    self._size += 1
+            if conn is None:
+                try:
+                    conn = self.connect()
+                except BaseException:
+                    self._forget()
+                    raise
+                with self._cond:
+                    self.stats["created"] += 1
+                return conn
+            if (time.monotonic() - last_used < self.idle_timeout
+                    and is_alive(conn)):
+                with self._cond:
+                    self.stats["reused"] += 1
+                return conn
+            self.discard(conn)
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            self.discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def discard(self, conn):
+        """Close a connection instead of returning it to the pool."""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._forget(discarded=True)
+
+    def _forget(self, discarded=False):
+        with self._cond:
+            self._size -= 1
+            self.stats["discarded"] += discarded
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self.discard(conn)
+
+    def snapshot(self):
+        with self._cond:
+            return dict(self.stats, size=self._size, idle=len(self._idle))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Return the process-wide pool, creating it on first use (and again
+    in forked children, which must not share the parent's sockets)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = ConnectionPool()
+        return _pool
+
+def configure_pool(**kwargs):
+    """Replace the process-wide pool, e.g. configure_pool(max_size=10)."""
+    global _pool
+    with _pool_lock:
+        old, _pool = _pool, ConnectionPool(**kwargs)
+    if old is not None and old.pid == os.getpid():
+        old.close()
+    return _pool
+
+def _dict_row(cursor, row):
+    return {col[0]: value for col, value in zip(cursor.description, row)}
+
+def open_cursor(conn, dictionary=False, buffered=False):
+    """Open a cursor; unbuffered by default so rows stay on the server
+    until fetched."""
+    if is_sqlite(conn):
+        cursor = conn.cursor()
+        if dictionary:
+            cursor.row_factory = _dict_row
+        return cursor
+    return conn.cursor(dictionary=dictionary, buffered=buffered)
+
+def stream_batches(sql, params=None, batch_size=PREFETCH, dictionary=True,
+                   conn=None):
+    """Yield lists of at most batch_size rows from an unbuffered cursor.
+
+    Only one batch is held client-side at a time, so memory and
+    time-to-first-row do not grow with the table. A connection is
+    borrowed from the shared pool when `conn` is not given.
+    """
+    owned = conn is None
+    if owned:
+        pool = get_pool()
+        conn = pool.acquire()
+    cursor = open_cursor(conn, dictionary)
+    try:
+        cursor.execute(dialect_sql(conn, sql), params or ())
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            yield batch
+    finally:
+        unread = not is_sqlite(conn) and conn.unread_result
+        if owned and unread:
+            # Dropping the connection is cheaper than draining the rows
+            pool.discard(conn)
+        else:
+            if unread:
+                conn.consume_results()
+            cursor.close()
+            if owned:
+                pool.release(conn)
+
+def stream_query(sql, params=None, batch_size=PREFETCH, dictionary=True,
+                 conn=None):
+    """Yield rows one by one, prefetching batch_size rows per round trip."""
+    for batch in stream_batches(sql, params, batch_size, dictionary, conn):
+        yield from batch
+
+# Query pushdown: filters are (column, op, value) tuples compiled into
+# the WHERE clause; callables are row predicates applied while streaming.
+SQL_OPERATORS = {"=", "!=", "<", "<=", ">", ">="}
+SQL_AGGREGATES = {
+    "count": "COUNT({})",
+    "sum": "SUM({})",
+    "avg": "AVG({})",
+    "min": "MIN({})",
+    "max": "MAX({})",
+}
+
+def _column(name):
+    if not name.isidentifier():
+        raise ValueError(f"Invalid column name: {name!r}")
+    return name
+
+def compile_filters(filters):
+    """Return (where_sql, params, residual) for a list of filters.
+
+    where_sql is empty when nothing can be pushed down; residual holds
+    the callables that must still run in Python.
+    """
+    clauses, params, residual = [], [], []
+    for f in filters or ():
+        if callable(f):
+            residual.append(f)
+            continue
+        column, op, value = f
+        if op not in SQL_OPERATORS:
+            raise ValueError(f"Unsupported operator: {op!r}")
+        clauses.append(f"{_column(column)} {op} %s")
+        params.append(value)
+    where_sql = " WHERE " + " AND ".join(clauses) if clauses else ""
+    return where_sql, tuple(params), residual
+
+def stream_filtered(columns, filters=None, batch_size=PREFETCH, conn=None):
+    """Yield batches of rows matching filters, filtered server-side
+    where possible. Batches may be short when Python predicates apply."""
+    where_sql, params, residual = compile_filters(filters)
+    cols = ", ".join(_column(c) for c in columns)
+    sql = f"SELECT {cols} FROM {TABLE_NAME}{where_sql}"
+    for batch in stream_batches(sql, params, batch_size, conn=conn):
+        if residual:
+            batch = [row for row in batch
+                     if all(pred(row) for pred in residual)]
+            if not batch:
+                continue
+        yield batch
+
+class Checkpoint:
+    """Progress of a keyset scan, saved to a JSON file every N batches.
+
+    Holds the last key handed out, the rows streamed and any counts the
+    consumer wants to keep across restarts. save_seconds accumulates the
+    time spent writing so checkpoint overhead can be measured.
+    """
+
+    def __init__(self, path, every=CHECKPOINT_EVERY):
+        self.path = path
+        self.every = every
+        self.last_key = None
+        self.rows = 0
+        self.batches = 0
+        self.counts = {}
+        self.saves = 0
+        self.save_seconds = 0.0
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.last_key = state["last_key"]
+            self.rows = state["rows"]
+            self.counts = state["counts"]
+
+    def advance(self, last_key, rows):
+        self.last_key = last_key
+        self.rows += rows
+        self.batches += 1
+        if self.batches % self.every == 0:
+            self.save()
+
+    def save(self):
+        start = time.perf_counter()
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"last_key": self.last_key, "rows": self.rows,
+                       "counts": self.counts}, f, default=str)
+        # Atomic swap: a crash never leaves a half-written checkpoint
+        os.replace(tmp, self.path)
+        self.saves += 1
+        self.save_seconds += time.perf_counter() - start
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def stream_checkpointed(columns, checkpoint, filters=None, key="user_id",
+                        batch_size=PREFETCH, conn=None):
+    """Like stream_filtered, but ordered by `key` and resumable.
+
+    Scanning restarts after checkpoint.last_key. A batch only counts as
+    done once the consumer asks for the next one, and the checkpoint
+    file is removed when the scan completes.
+    """
+    if key not in columns:
+        raise ValueError(f"Key column {key!r} must be selected")
+    filters = list(filters or ())
+    if checkpoint.last_key is not None:
+        filters.append((key, ">", checkpoint.last_key))
+    where_sql, params, residual = compile_filters(filters)
+    cols = ", ".join(_column(c) for c in columns)
+    sql = (f"SELECT {cols} FROM {TABLE_NAME}{where_sql} "
+           f"ORDER BY {_column(key)}")
+    for batch in stream_batches(sql, params, batch_size, conn=conn):
+        last_key = batch[-1][key]
+        size = len(batch)
+        if residual:
+            batch = [row for row in batch
+                     if all(pred(row) for pred in residual)]
+        if batch:
+            yield batch
+        checkpoint.advance(last_key, size)
+    checkpoint.clear()
+
+def key_ranges(count):
+    """Split the user_id (UUID4) key space into `count` ranges.
+
+    Returns (low, high) hex prefixes for key >= low AND key < high,
+    with None for an open end. UUID4s are uniform, so the ranges hold
+    about the same number of rows.
+    """
+    bounds = [f"{i * 256 // count:02x}" for i in range(1, count)]
+    lows = [None] + bounds
+    highs = bounds + [None]
+    return list(zip(lows, highs))
+
+def range_filters(low, high, key="user_id"):
+    filters = []
+    if low is not None:
+        filters.append((key, ">=", low))
+    if high is not None:
+        filters.append((key, "<", high))
+    return filters
+
+def to_columns(rows, columns):
+    """Turn a batch of dict rows into {column: column_values}.
+
+    age becomes a float64 NumPy array (array.array("d") without NumPy)
+    and user_id fixed-width bytes: a NumPy "S36" array, or one packed
+    bytes object of UUID_WIDTH-byte slots without NumPy. Other columns
+    stay lists.
+    """
+    result = {}
+    for column in columns:
+        values = [row[column] for row in rows]
+        if column == "age":
+            if np is not None:
+                values = np.array(values, dtype=np.float64)
+            else:
+                values = array("d", values)
+        elif column == "user_id":
+            if np is not None:
+                values = np.array(values, dtype=f"S{UUID_WIDTH}")
+            else:
+                values = b"".join(v.encode().ljust(UUID_WIDTH)
+                                  for v in values)
+        result[column] = values
+    return result
+
+def _python_aggregate(values, funcs):
+    count, total, low, high = 0, 0, None, None
+    for value in values:
+        count += 1
+        total += value
+        low = value if low is None or value < low else low
+        high = value if high is None or value > high else high
+    result = {"count": count, "sum": total if count else None,
+              "avg": total / count if count else None,
+              "min": low, "max": high}
+    return {func: result[func] for func in funcs}
+
+def aggregate(column, funcs=("count", "avg"), filters=None, conn=None):
+    """Compute aggregates of a column in SQL and return them as a dict.
+
+    Falls back to streaming the column when a filter is a Python
+    callable and cannot be pushed down.
+    """
+    unknown = set(funcs) - set(SQL_AGGREGATES)
+    if unknown:
+        raise ValueError(f"Unsupported aggregates: {sorted(unknown)}")
+    where_sql, params, residual = compile_filters(filters)
+    column = _column(column)
+    if residual:
+        values = (row[column] for batch in stream_filtered(
+            [column], filters, conn=conn) for row in batch)
+        return _python_aggregate(values, funcs)
+    exprs = ", ".join(SQL_AGGREGATES[f].format(column) for f in funcs)
+    sql = f"SELECT {exprs} FROM {TABLE_NAME}{where_sql}"
+    for row in stream_query(sql, params, dictionary=False, conn=conn):
+        return dict(zip(funcs, row))
+
+def histogram(column, bucket_width, filters=None, conn=None):
+    """Return {bucket_start: count} for a column, grouped in SQL."""
+    where_sql, params, residual = compile_filters(filters)
+    column = _column(column)
+    if residual:
+        counts = {}
+        for batch in stream_filtered([column], filters, conn=conn):
+            for row in batch:
+                bucket = math.floor(row[column] / bucket_width) * bucket_width
+                counts[bucket] = counts.get(bucket, 0) + 1
+        return dict(sorted(counts.items()))
+    sql = (f"SELECT FLOOR({column} / %s) AS bucket, COUNT(*) "
+           f"FROM {TABLE_NAME}{where_sql} GROUP BY bucket ORDER BY bucket")
+    if conn is None:
+        with get_pool().connection() as conn:
+            return histogram(column, bucket_width, filters, conn)
+    if is_sqlite(conn):
+        conn.create_function("FLOOR", 1, math.floor, deterministic=True)
+    return {bucket * bucket_width: count for bucket, count in stream_query(
+        sql, (bucket_width,) + params, dictionary=False, conn=conn)}
+
 def create_table(conn):
     cursor = conn.cursor()
     create_stmt = f"""
@@ -35,13 +468,33 @@ def create_table(conn):
         name VARCHAR(255) NOT NULL,
         email VARCHAR(255) NOT NULL,
         age DECIMAL(5,2) NOT NULL,
-        INDEX (user_id)
+        INDEX (user_id),
+        UNIQUE KEY uq_user_email (email)
     ) ENGINE=InnoDB
     """
     cursor.execute(create_stmt)
     conn.commit()
     cursor.close()
 
+def ensure_email_index(conn):
+    """Add the unique email index to tables created before it existed.
+
+    The bulk loader relies on it to skip duplicate emails server-side.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS "
+        "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND INDEX_NAME = %s",
+        (DB_NAME, TABLE_NAME, "uq_user_email")
+    )
+    (count,) = cursor.fetchone()
+    if count == 0:
+        cursor.execute(
+            f"ALTER TABLE {TABLE_NAME} ADD UNIQUE KEY uq_user_email (email)"
+        )
+        conn.commit()
+    cursor.close()
+
 def insert_data(conn, data_rows):
     cursor = conn.cursor()
     for row in data_rows:
@@ -60,12 +513,176 @@ def insert_data(conn, data_rows):
     conn.commit()
     cursor.close()
 
+def chunked(rows, size):
+    """Yield lists of at most `size` items from any iterable."""
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            break
+        yield chunk
+
+_DONE = object()
+
+def prefetch_chunks(rows, size, depth=QUEUE_DEPTH):
+    """Parse chunks on a background thread, at most `depth` ahead.
+
+    The bounded queue gives backpressure: the parser blocks while the
+    writer is busy, so memory stays at roughly depth * size rows.
+    """
+    q = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        # Give up once the consumer has gone away
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for chunk in chunked(rows, size):
+                if not put(chunk):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(e)
+
+    worker = threading.Thread(target=produce, daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        worker.join()
+
+def bulk_insert_data(conn, data_rows, chunk_size=BATCH_SIZE,
+                     queue_depth=0, progress_every=None, verbose=True):
+    """Insert rows in chunks with one multi-row INSERT IGNORE per chunk.
+
+    Duplicate emails are dropped by the unique email index instead of a
+    SELECT per row, and each chunk is committed once. With queue_depth
+    set, CSV parsing runs ahead on a thread (see prefetch_chunks);
+    progress_every prints a progress line every that many rows. Returns
+    a dict with rows read, rows inserted, elapsed seconds and rows/sec.
+    """
+    cursor = conn.cursor()
+    insert_stmt = dialect_sql(conn, (
+        f"INSERT IGNORE INTO {TABLE_NAME} (user_id, name, email, age) "
+        "VALUES (%s, %s, %s, %s)"
+    ))
+    total = 0
+    inserted = 0
+    next_report = progress_every
+    if queue_depth:
+        chunks = prefetch_chunks(data_rows, chunk_size, queue_depth)
+    else:
+        chunks = chunked(data_rows, chunk_size)
+    start = time.perf_counter()
+    for chunk in chunks:
+        cursor.executemany(insert_stmt, [
+            (str(uuid.uuid4()), row["name"], row["email"], row["age"])
+            for row in chunk
+        ])
+        inserted += max(cursor.rowcount, 0)
+        conn.commit()
+        total += len(chunk)
+        if next_report and total >= next_report:
+            elapsed = time.perf_counter() - start
+            print(f"... {total} rows ({total / elapsed:.0f} rows/sec)")
+            next_report += progress_every
+    cursor.close()
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed else 0.0
+    if verbose:
+        print(f"Loaded {total} rows ({inserted} new) in {elapsed:.2f}s "
+              f"({rate:.0f} rows/sec)")
+    return {"rows": total, "inserted": inserted,
+            "seconds": elapsed, "rows_per_sec": rate}
+
 def load_csv(filename):
+    """Yield CSV rows one at a time instead of reading the whole file."""
     with open(filename, newline='') as f:
-        reader = csv.DictReader(f)
-        return list(reader)
+        yield from csv.DictReader(f)
+
+def csv_shards(filename, count):
+    """Split a CSV file into `count` byte ranges aligned to line starts.
 
-def main():
+    Returns the header fieldnames and a list of (start, end) offsets.
+    Quoted fields containing newlines are not supported.
+    """
+    size = os.path.getsize(filename)
+    with open(filename, "rb") as f:
+        header = f.readline()
+        fieldnames = next(csv.reader([header.decode()]))
+        body = f.tell()
+        bounds = [body]
+        for i in range(1, count):
+            f.seek(body + (size - body) * i // count)
+            f.readline()
+            bounds.append(max(f.tell(), bounds[-1]))
+        bounds.append(size)
+    shards = [(bounds[i], bounds[i + 1]) for i in range(count)]
+    return fieldnames, [s for s in shards if s[0] < s[1]]
+
+def read_shard(filename, fieldnames, start, end):
+    """Yield the CSV rows whose lines start inside [start, end)."""
+    def lines():
+        with open(filename, "rb") as f:
+            f.seek(start)
+            while f.tell() < end:
+                line = f.readline()
+                if not line:
+                    break
+                yield line.decode()
+    yield from csv.DictReader(lines(), fieldnames=fieldnames)
+
+def _seed_shard(filename, fieldnames, start, end, connect, chunk_size):
+    conn = connect()
+    try:
+        return bulk_insert_data(conn, read_shard(filename, fieldnames,
+                                                 start, end),
+                                chunk_size, verbose=False)
+    finally:
+        conn.close()
+
+def parallel_seed(filename=CSV_FILE, workers=4, connect=connect_to_prodev,
+                  chunk_size=BATCH_SIZE):
+    """Seed from byte-range shards, one process and connection per shard.
+
+    `connect` must be picklable; pass e.g.
+    functools.partial(sqlite3.connect, path, timeout=30) to seed a
+    SQLite stand-in. Returns the merged per-shard stats.
+    """
+    fieldnames, shards = csv_shards(filename, workers)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_seed_shard, filename, fieldnames, lo, hi,
+                        connect, chunk_size)
+            for lo, hi in shards
+        ]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+    total = sum(r["rows"] for r in results)
+    inserted = sum(r["inserted"] for r in results)
+    rate = total / elapsed if elapsed else 0.0
+    print(f"Loaded {total} rows ({inserted} new) from {len(shards)} shards "
+          f"in {elapsed:.2f}s ({rate:.0f} rows/sec)")
+    return {"rows": total, "inserted": inserted, "seconds": elapsed,
+            "rows_per_sec": rate, "shards": results}
+
+def main(workers=1):
     # Step 1: connect to MySQL server (no database)
     conn = connect_db()
     create_database(conn)
@@ -74,15 +691,19 @@ def main():
     # Step 2: connect to ALX_prodev
     conn = connect_to_prodev()
     create_table(conn)
+    ensure_email_index(conn)
 
-    # Step 3: load sample data
-    data = load_csv(CSV_FILE)
-
-    # Step 4: insert if not exists
-    insert_data(conn, data)
-
-    conn.close()
+    # Step 3 and 4: stream sample data and bulk insert it,
+    # duplicates skipped by the email index
+    if workers > 1:
+        conn.close()
+        parallel_seed(CSV_FILE, workers)
+    else:
+        data = load_csv(CSV_FILE)
+        bulk_insert_data(conn, data, queue_depth=QUEUE_DEPTH,
+                         progress_every=100000)
+        conn.close()
     print("✅ Database seeded successfully.")
 
 if __name__ == "__main__":
-    main()
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1)